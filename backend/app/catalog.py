@@ -0,0 +1,135 @@
+import gzip
+import json
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from .models import CacheVersion, Product, ProductAttribute, ProductTombstone
+from .schemas import ProductRead
+
+CATALOG_KEY = "catalog"
+FULL_PRICE_ROLES = {"admin", "finance"}
+GZIP_LEVEL = 6
+
+
+def bump_catalog_version(db: Session) -> int:
+    # Called inside the writing transaction; every worker compares this counter
+    # with the version its cached catalog was built from. Returns the new version
+    # so the written products can be stamped with it for delta sync.
+    if db.get_bind().dialect.name == "mysql":
+        statement = mysql_insert(CacheVersion).values(name=CATALOG_KEY, version=1)
+        db.execute(statement.on_duplicate_key_update(version=CacheVersion.__table__.c.version + 1))
+    elif db.query(CacheVersion).filter(CacheVersion.name == CATALOG_KEY).update(
+        {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+    ) == 0:
+        db.add(CacheVersion(name=CATALOG_KEY, version=1))
+        db.flush()
+    return catalog_version(db)
+
+
+def catalog_version(db: Session) -> int:
+    return db.query(CacheVersion.version).filter(CacheVersion.name == CATALOG_KEY).scalar() or 0
+
+
+def touch_products(db: Session, version: int, *criteria) -> None:
+    db.query(Product).filter(*criteria).update(
+        {Product.catalog_version: version, Product.updated_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+
+
+def add_tombstone(db: Session, product_id: int, version: int) -> None:
+    tombstone = db.get(ProductTombstone, product_id) or ProductTombstone(product_id=product_id)
+    tombstone.catalog_version = version
+    tombstone.deleted_at = datetime.utcnow()
+    db.add(tombstone)
+
+
+def price_tier(role: str) -> str:
+    return "full" if role in FULL_PRICE_ROLES else "masked"
+
+
+def mask_product_dict(product: dict) -> dict:
+    masked = dict(product, base_price=None)
+    masked["attributes"] = [
+        dict(attribute, options=[dict(option, price_delta=None) for option in attribute["options"]])
+        for attribute in product["attributes"]
+    ]
+    return masked
+
+
+def dump_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CatalogCache:
+    # Holds the serialized product catalog for both price tiers, built from one
+    # query pass and replaced whenever the shared catalog version moves.
+
+    def __init__(self):
+        self.version = None
+        self._tiers = {}
+        self._product_versions = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session) -> int:
+        version = catalog_version(db)
+        if self.version != version:
+            with self._lock:
+                if self.version != version:
+                    self._tiers, self._product_versions = self.build(db, version)
+                    self.version = version
+        return version
+
+    def get(self, db: Session, role: str) -> bytes:
+        self.refresh(db)
+        return self._tiers[price_tier(role)]["list"]
+
+    def snapshot(self, db: Session, role: str, since: Optional[int] = None) -> tuple[int, bytes]:
+        # Returns (version, gzipped body). A full snapshot comes pre-compressed from
+        # the cache; deltas are small and compressed per request.
+        version = self.refresh(db)
+        tier = self._tiers[price_tier(role)]
+        if since is None or since > version:
+            return version, tier["snapshot_gz"]
+        changed = [
+            product
+            for product in tier["products"]
+            if self._product_versions.get(product["id"], 0) > since
+        ]
+        deleted = [
+            product_id
+            for (product_id,) in db.query(ProductTombstone.product_id).filter(
+                ProductTombstone.catalog_version > since
+            )
+        ]
+        body = dump_json({"version": version, "full": False, "products": changed, "deleted": deleted})
+        return version, gzip.compress(body, GZIP_LEVEL)
+
+    def build(self, db: Session, version: int) -> tuple[dict, dict]:
+        products = (
+            db.query(Product)
+            .options(
+                joinedload(Product.category),
+                selectinload(Product.images),
+                selectinload(Product.attributes).selectinload(ProductAttribute.options),
+            )
+            .order_by(Product.id.desc())
+            .all()
+        )
+        full = [ProductRead.model_validate(product).model_dump(mode="json") for product in products]
+        tiers = {}
+        for name, tier_products in (("full", full), ("masked", [mask_product_dict(item) for item in full])):
+            snapshot = {"version": version, "full": True, "products": tier_products, "deleted": []}
+            tiers[name] = {
+                "products": tier_products,
+                "list": dump_json(tier_products),
+                "snapshot_gz": gzip.compress(dump_json(snapshot), GZIP_LEVEL),
+            }
+        return tiers, {product.id: product.catalog_version for product in products}
+
+
+catalog_cache = CatalogCache()
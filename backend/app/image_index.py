@@ -0,0 +1,554 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+from uuid import uuid4
+
+import numpy as np
+from PIL import Image
+
+from .vector_search import IVF_MIN_ROWS, normalize_rows, train_ivf
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts
+    fcntl = None
+
+MODEL_NAME = "clip-ViT-B-32"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+DECODE_MIN_SIDE = 224
+DEFAULT_BATCH_SIZE = int(os.getenv("IMAGE_INDEX_BATCH_SIZE", "32"))
+DEFAULT_WORKERS = int(os.getenv("IMAGE_INDEX_WORKERS", str(os.cpu_count() or 1)))
+PREFETCH_BATCHES = 2
+INDEX_DTYPE = os.getenv("IMAGE_INDEX_DTYPE", "float32")
+MANIFEST_NAME = "manifest.json"
+SEGMENTS_DIR = "segments"
+CATALOG_DIR = "catalog"
+MANIFEST_LOCK_NAME = ".manifest.lock"
+SEGMENT_GRACE_SECONDS = 600
+MAX_DELTA_SEGMENTS = 8
+
+_manifest_thread_lock = threading.Lock()
+
+
+def load_images(folder: Path):
+    for path in sorted(folder.glob("**/*")):
+        if path.suffix.lower() in IMAGE_SUFFIXES:
+            yield path
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def embedding_key(model_name: str, digest: str) -> str:
+    return f"{model_name}:{digest}"
+
+
+def media_url(path) -> str:
+    path_obj = Path(path)
+    if path_obj.is_absolute():
+        try:
+            path_obj = path_obj.relative_to(Path.cwd())
+        except ValueError:
+            pass
+    if path_obj.parts and path_obj.parts[0] == "media":
+        return f"/{'/'.join(path_obj.parts)}"
+    return f"/media/{path_obj.name}"
+
+
+def read_manifest(index_dir: Path) -> Optional[dict]:
+    path = index_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+@contextmanager
+def manifest_lock(index_dir: Path):
+    # Serializes read-modify-write of the manifest across threads and workers.
+    index_dir.mkdir(parents=True, exist_ok=True)
+    with _manifest_thread_lock, (index_dir / MANIFEST_LOCK_NAME).open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def write_manifest(index_dir: Path, manifest: dict) -> None:
+    # Readers only ever look at manifest.json, so os.replace swaps the index atomically.
+    tmp_path = index_dir / f"{MANIFEST_NAME}.tmp"
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False)
+    os.replace(tmp_path, index_dir / MANIFEST_NAME)
+
+
+def write_segment(index_dir: Path, embeddings: np.ndarray, table: dict, dtype: str = INDEX_DTYPE) -> str:
+    segment_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid4().hex[:8]}"
+    segments_dir = index_dir / SEGMENTS_DIR
+    tmp_dir = segments_dir / f".tmp-{segment_id}"
+    tmp_dir.mkdir(parents=True)
+    embeddings = normalize_rows(embeddings).astype(dtype)
+    np.save(tmp_dir / "embeddings.npy", embeddings)
+    if len(embeddings) >= IVF_MIN_ROWS:
+        np.savez(tmp_dir / "ivf.npz", **train_ivf(embeddings))
+    with (tmp_dir / "table.json").open("w", encoding="utf-8") as handle:
+        json.dump(table, handle, ensure_ascii=False)
+    tmp_dir.rename(segments_dir / segment_id)
+    return segment_id
+
+
+def load_segment(index_dir: Path, segment_id: str, mmap: bool = True) -> dict:
+    segment_dir = index_dir / SEGMENTS_DIR / segment_id
+    embeddings = np.load(segment_dir / "embeddings.npy", mmap_mode="r" if mmap else None)
+    with (segment_dir / "table.json").open("r", encoding="utf-8") as handle:
+        table = json.load(handle)
+    ivf = None
+    if (segment_dir / "ivf.npz").exists():
+        with np.load(segment_dir / "ivf.npz") as data:
+            ivf = {key: data[key] for key in data.files}
+    return {"id": segment_id, "embeddings": embeddings, "table": table, "ivf": ivf}
+
+
+def read_index(index_dir: Path) -> Optional[dict]:
+    manifest = read_manifest(index_dir)
+    if manifest is None:
+        return None
+    segments = [load_segment(index_dir, segment["id"]) for segment in manifest.get("segments", [])]
+    scopes, entities = load_catalog(index_dir, manifest)
+    return {"manifest": manifest, "segments": segments, "scopes": scopes, "entities": entities}
+
+
+def cleanup_stale(directory: Path, keep: set, grace_seconds: float = SEGMENT_GRACE_SECONDS) -> None:
+    # Unlinking mmapped files is safe on POSIX; the grace period covers workers that
+    # read the previous manifest but have not opened its files yet.
+    if not directory.exists():
+        return
+    now = time.time()
+    for path in directory.iterdir():
+        if path.name in keep or now - path.stat().st_mtime < grace_seconds:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+def cleanup_segments(index_dir: Path, keep: set) -> None:
+    cleanup_stale(index_dir / SEGMENTS_DIR, keep)
+
+
+def owner_scopes(owner: dict) -> list:
+    scopes = ["all", f"type:{owner['type']}", f"product:{owner['product_id']}"]
+    if owner.get("category_id") is not None:
+        scopes.append(f"category:{owner['category_id']}")
+    if owner.get("attribute_id") is not None:
+        scopes.append(f"attribute:{owner['attribute_id']}")
+    return scopes
+
+
+def write_catalog(index_dir: Path, owners: dict, only_if_stale: bool = False) -> None:
+    # The catalog maps each scope (attribute, product, category, type) to the rows
+    # of every segment it owns, so scoped searches only score their own subset, and
+    # keeps the owning options/product images of every indexed URL so searches
+    # resolve matches without touching the database.
+    with manifest_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        if manifest is None:
+            return
+        segment_ids = [segment["id"] for segment in manifest["segments"]]
+        catalog = manifest.get("catalog")
+        if only_if_stale and catalog and catalog.get("segments") == segment_ids:
+            return
+        tombstones = set(manifest.get("tombstones", []))
+        arrays = {}
+        entities = {}
+        for segment_id in segment_ids:
+            rows_by_scope = {}
+            for row, url in enumerate(segment_urls(index_dir, segment_id)):
+                if url in tombstones or url not in owners:
+                    continue
+                entities[url] = owners[url]
+                for owner in owners[url]:
+                    for scope in owner_scopes(owner):
+                        rows_by_scope.setdefault(scope, set()).add(row)
+            for scope, rows in rows_by_scope.items():
+                arrays[f"{segment_id}|{scope}"] = np.array(sorted(rows), dtype=np.int32)
+        catalog_id = save_catalog(index_dir, manifest, arrays, entities)
+    cleanup_stale(index_dir / CATALOG_DIR, {f"{catalog_id}.npz", f"{catalog_id}.json"})
+
+
+def update_catalog(index_dir: Path, urls: list, load_owners: Callable[[set], dict]) -> bool:
+    # Patches the current catalog in place of a rebuild: only `urls` and the URLs of
+    # segments appended since the catalog was written get their owners reloaded.
+    # Returns False when there is no catalog to patch or its segments were merged or
+    # rebuilt away; the caller then writes a full catalog.
+    with manifest_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        if manifest is None:
+            return True
+        catalog = manifest.get("catalog")
+        segment_ids = [segment["id"] for segment in manifest["segments"]]
+        if not catalog or not set(catalog["segments"]) <= set(segment_ids):
+            return False
+        scopes, entities = load_catalog(index_dir, {**manifest, "segments": [{"id": i} for i in catalog["segments"]]})
+        tables = {segment_id: segment_urls(index_dir, segment_id) for segment_id in segment_ids}
+        changed = set(urls)
+        for segment_id in segment_ids:
+            if segment_id not in scopes:
+                changed.update(tables[segment_id])
+        owners = load_owners(changed) if changed else {}
+        tombstones = set(manifest.get("tombstones", []))
+        arrays = {}
+        for segment_id in segment_ids:
+            rows_by_scope = {
+                scope: set(rows.tolist()) for scope, rows in scopes.get(segment_id, {}).items()
+            }
+            for row, url in enumerate(tables[segment_id]):
+                if url not in changed:
+                    continue
+                for rows in rows_by_scope.values():
+                    rows.discard(row)
+                if url in tombstones:
+                    continue
+                for owner in owners.get(url, []):
+                    for scope in owner_scopes(owner):
+                        rows_by_scope.setdefault(scope, set()).add(row)
+            for scope, rows in rows_by_scope.items():
+                if rows:
+                    arrays[f"{segment_id}|{scope}"] = np.array(sorted(rows), dtype=np.int32)
+        for url in changed:
+            if owners.get(url) and url not in tombstones:
+                entities[url] = owners[url]
+            else:
+                entities.pop(url, None)
+        catalog_id = save_catalog(index_dir, manifest, arrays, entities)
+    cleanup_stale(index_dir / CATALOG_DIR, {f"{catalog_id}.npz", f"{catalog_id}.json"})
+    return True
+
+
+def segment_urls(index_dir: Path, segment_id: str) -> list:
+    with (index_dir / SEGMENTS_DIR / segment_id / "table.json").open("r", encoding="utf-8") as handle:
+        return json.load(handle)["urls"]
+
+
+def save_catalog(index_dir: Path, manifest: dict, arrays: dict, entities: dict) -> str:
+    # Called under the manifest lock; points the manifest at the new catalog files.
+    catalog_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid4().hex[:8]}"
+    catalog_dir = index_dir / CATALOG_DIR
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = catalog_dir / f".tmp-{catalog_id}.npz"
+    np.savez(tmp_path, **arrays)
+    tmp_path.rename(catalog_dir / f"{catalog_id}.npz")
+    tmp_path = catalog_dir / f".tmp-{catalog_id}.json"
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(entities, handle, ensure_ascii=False)
+    tmp_path.rename(catalog_dir / f"{catalog_id}.json")
+    manifest["catalog"] = {"id": catalog_id, "segments": [segment["id"] for segment in manifest["segments"]]}
+    write_manifest(index_dir, manifest)
+    return catalog_id
+
+
+def load_catalog(index_dir: Path, manifest: dict) -> tuple:
+    # Entities are keyed by URL and stay valid when segments change; the scope rows
+    # of a catalog written for another set of segments are stale and must be rebuilt.
+    catalog = manifest.get("catalog")
+    if not catalog:
+        return None, None
+    catalog_dir = index_dir / CATALOG_DIR
+    with (catalog_dir / f"{catalog['id']}.json").open("r", encoding="utf-8") as handle:
+        entities = json.load(handle)
+    segment_ids = [segment["id"] for segment in manifest.get("segments", [])]
+    if catalog.get("segments") != segment_ids:
+        return None, entities
+    scopes = {segment_id: {} for segment_id in segment_ids}
+    with np.load(catalog_dir / f"{catalog['id']}.npz") as data:
+        for key in data.files:
+            segment_id, scope = key.split("|", 1)
+            scopes[segment_id][scope] = data[key]
+    return scopes, entities
+
+
+def reusable_entries(index_data: Optional[dict], model_name: str):
+    # Indexes built by another model are not reused.
+    if not index_data or index_data["manifest"].get("model") != model_name:
+        return {}, {}
+    cache = {}
+    stats = {}
+    for segment in index_data["segments"]:
+        table = segment["table"]
+        for path, digest, stat, embedding in zip(
+            table["files"], table["hashes"], table["stats"], segment["embeddings"]
+        ):
+            cache[embedding_key(model_name, digest)] = embedding
+            stats[path] = (tuple(stat), digest)
+    return cache, stats
+
+
+def decode_image(path, min_side: int = DECODE_MIN_SIDE) -> Image.Image:
+    image = Image.open(path)
+    # JPEG can decode straight to a reduced scale; CLIP only needs ~224px anyway.
+    image.draft("RGB", (min_side, min_side))
+    image = image.convert("RGB")
+    scale = min_side / min(image.size)
+    if scale < 1:
+        size = (max(min_side, round(image.width * scale)), max(min_side, round(image.height * scale)))
+        image = image.resize(size, Image.BICUBIC)
+    return image
+
+
+def iter_decoded_batches(
+    paths: list,
+    batch_size: int,
+    workers: int,
+    on_error: Optional[Callable[[Path, Exception], None]] = None,
+):
+    batches = [paths[i : i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit(batch):
+            pending.append((batch, [executor.submit(decode_image, path) for path in batch]))
+
+        # Keep a couple of batches decoding ahead of the encoder.
+        for batch in batches[:PREFETCH_BATCHES]:
+            submit(batch)
+        next_batch = PREFETCH_BATCHES
+        while pending:
+            batch, futures = pending.popleft()
+            if next_batch < len(batches):
+                submit(batches[next_batch])
+                next_batch += 1
+            decoded_paths = []
+            images = []
+            for path, future in zip(batch, futures):
+                try:
+                    images.append(future.result())
+                    decoded_paths.append(path)
+                except Exception as exc:
+                    if on_error:
+                        on_error(path, exc)
+            yield decoded_paths, images
+
+
+def build_image_index(
+    media_dir: Path,
+    index_dir: Path,
+    encode_batch: Callable[[list], np.ndarray],
+    model_name: str = MODEL_NAME,
+    incremental: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None,
+    on_error: Optional[Callable[[Path, Exception], None]] = None,
+    on_progress: Optional[Callable[[int, int, float], None]] = None,
+) -> dict:
+    started = time.perf_counter()
+    workers = workers or DEFAULT_WORKERS
+    previous = read_index(index_dir)
+    previous_segments = {segment["id"] for segment in previous["segments"]} if previous else set()
+    cache, known_stats = reusable_entries(previous if incremental else None, model_name)
+    entries = []
+    missing = {}
+    for image_path in load_images(media_dir):
+        try:
+            stat = image_path.stat()
+            file_stat = (stat.st_size, stat.st_mtime_ns)
+            # Unchanged size and mtime means the stored content hash is still valid.
+            known = known_stats.get(str(image_path))
+            if known and known[0] == file_stat:
+                digest = known[1]
+            else:
+                digest = file_digest(image_path)
+        except Exception as exc:
+            if on_error:
+                on_error(image_path, exc)
+            continue
+        key = embedding_key(model_name, digest)
+        entries.append((image_path, digest, file_stat, key))
+        if key not in cache and key not in missing:
+            missing[key] = image_path
+
+    encode_started = time.perf_counter()
+    processed = 0
+    keys_by_path = {path: key for key, path in missing.items()}
+    if on_progress:
+        on_progress(0, len(missing), 0.0)
+    for paths, images in iter_decoded_batches(list(missing.values()), batch_size, workers, on_error):
+        if images:
+            vectors = encode_batch(images)
+            for path, vector in zip(paths, vectors):
+                cache[keys_by_path[path]] = vector
+        processed += len(images)
+        if on_progress:
+            on_progress(processed, len(missing), time.perf_counter() - encode_started)
+    encode_seconds = time.perf_counter() - encode_started
+
+    table = {"files": [], "urls": [], "hashes": [], "stats": []}
+    embeddings = []
+    for image_path, digest, file_stat, key in entries:
+        embedding = cache.get(key)
+        if embedding is None:
+            continue
+        table["files"].append(str(image_path))
+        table["urls"].append(media_url(image_path))
+        table["hashes"].append(digest)
+        table["stats"].append(file_stat)
+        embeddings.append(embedding)
+    files = table["files"]
+    index_dir.mkdir(parents=True, exist_ok=True)
+    segment_id = write_segment(index_dir, np.array(embeddings), table)
+    with manifest_lock(index_dir):
+        # Keep live additions and removals that landed while this build was running.
+        current = read_manifest(index_dir) or {}
+        same_model = current.get("model") == model_name
+        segments = [{"id": segment_id, "rows": len(files)}] + [
+            segment
+            for segment in current.get("segments", [])
+            if same_model and segment["id"] not in previous_segments
+        ]
+        manifest = {
+            "model": model_name,
+            "dtype": INDEX_DTYPE,
+            "rows": sum(segment["rows"] for segment in segments),
+            "segments": segments,
+            "tombstones": current.get("tombstones", []) if same_model else [],
+            "built_at": time.time(),
+        }
+        write_manifest(index_dir, manifest)
+    cleanup_segments(index_dir, {segment["id"] for segment in segments})
+    return {
+        "total_images": len(files),
+        "encoded_images": processed,
+        "reused_images": len(files) - processed,
+        "images_per_second": round(processed / encode_seconds, 2) if encode_seconds > 0 else 0.0,
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def merge_segments(index_dir: Path, segment_ids: list, tombstones: set) -> tuple:
+    tables = {"files": [], "urls": [], "hashes": [], "stats": []}
+    embeddings = []
+    for segment_id in segment_ids:
+        segment = load_segment(index_dir, segment_id, mmap=False)
+        for row, url in enumerate(segment["table"]["urls"]):
+            if url in tombstones:
+                continue
+            for column in tables:
+                tables[column].append(segment["table"][column][row])
+            embeddings.append(segment["embeddings"][row])
+    return tables, np.array(embeddings)
+
+
+def add_images(
+    index_dir: Path,
+    paths: list,
+    encode_batch: Callable[[list], np.ndarray],
+    model_name: str = MODEL_NAME,
+) -> dict:
+    # Live path for new uploads: embed only what the index lacks and append it as a
+    # small delta segment; full rebuilds later fold the deltas back into one segment.
+    existing = read_index(index_dir)
+    if existing and existing["manifest"].get("model") != model_name:
+        return {"added": 0, "restored": 0}
+    cache, _ = reusable_entries(existing, model_name)
+    entries = []
+    images = []
+    image_keys = []
+    for path in paths:
+        path = Path(path)
+        stat = path.stat()
+        digest = file_digest(path)
+        key = embedding_key(model_name, digest)
+        entries.append((path, digest, (stat.st_size, stat.st_mtime_ns), key))
+        if key not in cache and key not in image_keys:
+            images.append(decode_image(path))
+            image_keys.append(key)
+    if images:
+        for key, vector in zip(image_keys, encode_batch(images)):
+            cache[key] = vector
+
+    with manifest_lock(index_dir):
+        manifest = read_manifest(index_dir) or {
+            "model": model_name,
+            "dtype": INDEX_DTYPE,
+            "rows": 0,
+            "segments": [],
+            "tombstones": [],
+            "built_at": time.time(),
+        }
+        tombstones = set(manifest.get("tombstones", []))
+        indexed = {}
+        for segment in manifest["segments"]:
+            table = load_segment(index_dir, segment["id"])["table"]
+            indexed.update(zip(table["urls"], table["hashes"]))
+        table = {"files": [], "urls": [], "hashes": [], "stats": []}
+        embeddings = []
+        restored = 0
+        for path, digest, file_stat, key in entries:
+            url = media_url(path)
+            if indexed.get(url) == digest:
+                if url in tombstones:
+                    tombstones.discard(url)
+                    restored += 1
+                continue
+            table["files"].append(str(path))
+            table["urls"].append(url)
+            table["hashes"].append(digest)
+            table["stats"].append(file_stat)
+            embeddings.append(cache[key])
+            tombstones.discard(url)
+        if embeddings:
+            manifest["segments"].append(
+                {"id": write_segment(index_dir, np.array(embeddings), table), "rows": len(embeddings)}
+            )
+        deltas = [segment for segment in manifest["segments"] if segment["rows"] < IVF_MIN_ROWS]
+        if len(deltas) > MAX_DELTA_SEGMENTS:
+            merged_ids = {segment["id"] for segment in deltas}
+            merged_table, merged = merge_segments(index_dir, [segment["id"] for segment in deltas], tombstones)
+            manifest["segments"] = [
+                segment for segment in manifest["segments"] if segment["id"] not in merged_ids
+            ]
+            if len(merged):
+                manifest["segments"].append(
+                    {"id": write_segment(index_dir, merged, merged_table), "rows": len(merged)}
+                )
+            live_urls = set()
+            for segment in manifest["segments"]:
+                live_urls.update(load_segment(index_dir, segment["id"])["table"]["urls"])
+            tombstones &= live_urls
+        manifest["rows"] = sum(segment["rows"] for segment in manifest["segments"])
+        manifest["tombstones"] = sorted(tombstones)
+        write_manifest(index_dir, manifest)
+    cleanup_segments(index_dir, {segment["id"] for segment in manifest["segments"]})
+    return {"added": len(embeddings), "restored": restored}
+
+
+def remove_images(index_dir: Path, urls: list) -> int:
+    with manifest_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        if manifest is None:
+            return 0
+        tombstones = set(manifest.get("tombstones", []))
+        indexed = set()
+        for segment in manifest["segments"]:
+            indexed.update(load_segment(index_dir, segment["id"])["table"]["urls"])
+        removed = {url for url in urls if url in indexed} - tombstones
+        if removed:
+            manifest["tombstones"] = sorted(tombstones | removed)
+            write_manifest(index_dir, manifest)
+        return len(removed)
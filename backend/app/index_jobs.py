@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts
+    fcntl = None
+
+JOBS_DIR = "jobs"
+LOCK_NAME = ".build.lock"
+MAX_JOB_ERRORS = 50
+KEEP_JOB_FILES = 20
+PROGRESS_FLUSH_SECONDS = 1.0
+
+
+class IndexBuildJob:
+    def __init__(self, jobs_dir: Path):
+        self.id = uuid4().hex
+        self.status = "running"
+        self.phase = "scanning"
+        self.processed = 0
+        self.total = 0
+        self.images_per_second = 0.0
+        self.eta_seconds = None
+        self.errors = []
+        self.error_count = 0
+        self.message = "索引任务已启动"
+        self.result = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._path = jobs_dir / f"{self.id}.json"
+        self._flushed_at = 0.0
+
+    def progress(self, processed: int, total: int, elapsed: float) -> None:
+        self.phase = "encoding"
+        self.processed = processed
+        self.total = total
+        if elapsed > 0 and processed:
+            self.images_per_second = round(processed / elapsed, 2)
+            self.eta_seconds = round((total - processed) / self.images_per_second, 1)
+        self.flush()
+
+    def error(self, path: Path, exc: Exception) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append({"file": str(path), "error": str(exc)})
+
+    def finish(self, result: dict) -> None:
+        self.status = "completed"
+        self.phase = "done"
+        self.eta_seconds = 0
+        self.result = result
+        self.message = "索引完成"
+        self.finished_at = time.time()
+        self.flush(force=True)
+
+    def fail(self, exc: Exception) -> None:
+        self.status = "failed"
+        self.message = f"索引失败: {exc}"
+        self.finished_at = time.time()
+        self.flush(force=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "processed": self.processed,
+            "total": self.total,
+            "images_per_second": self.images_per_second,
+            "eta_seconds": self.eta_seconds,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "message": self.message,
+            "result": self.result,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def flush(self, force: bool = False) -> None:
+        # Persisted so any uvicorn worker can answer status requests for this job.
+        now = time.time()
+        if not force and now - self._flushed_at < PROGRESS_FLUSH_SECONDS:
+            return
+        self._flushed_at = now
+        tmp_path = self._path.with_name(f"{self._path.name}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(self.to_dict(), handle, ensure_ascii=False)
+        os.replace(tmp_path, self._path)
+
+
+class IndexBuildRunner:
+    # Runs at most one index build at a time: a thread lock guards this process and
+    # an flock on the index directory guards the other workers.
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = index_dir
+        self.jobs = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    @property
+    def jobs_dir(self) -> Path:
+        return self.index_dir / JOBS_DIR
+
+    def start(self, build: Callable[[IndexBuildJob], dict]):
+        with self._lock:
+            if self._current is not None and self._current.status == "running":
+                return self._current.to_dict(), False
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            handle = (self.index_dir / LOCK_NAME).open("a+")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    handle.seek(0)
+                    running_id = handle.read().strip()
+                    handle.close()
+                    return self.get(running_id) or {"job_id": running_id, "status": "running"}, False
+            job = IndexBuildJob(self.jobs_dir)
+            handle.seek(0)
+            handle.truncate()
+            handle.write(job.id)
+            handle.flush()
+            job.flush(force=True)
+            self.jobs[job.id] = job
+            self._current = job
+            self._prune_job_files()
+        threading.Thread(
+            target=self._run, args=(job, build, handle), name=f"index-build-{job.id[:8]}", daemon=True
+        ).start()
+        return job.to_dict(), True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self.jobs_dir / f"{job_id}.json"
+        if not job_id.isalnum() or not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _run(self, job: IndexBuildJob, build: Callable[[IndexBuildJob], dict], handle) -> None:
+        try:
+            job.finish(build(job))
+        except Exception as exc:
+            job.fail(exc)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def _prune_job_files(self) -> None:
+        files = sorted(self.jobs_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        for path in files[:-KEEP_JOB_FILES]:
+            path.unlink(missing_ok=True)
+            self.jobs.pop(path.stem, None)
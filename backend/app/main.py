@@ -1,8 +1,10 @@
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from .database import Base, engine
-from .routes import admin, auth, customers, orders, products, search
+from .database import Base, SessionLocal, engine
+from .routes import admin, auth, customers, orders, products, reports, search
+from .text_search import product_text_index
 
 Base.metadata.create_all(bind=engine)
 
@@ -29,6 +31,21 @@ app.include_router(orders.router)
 app.include_router(admin.router)
 app.include_router(search.router)
 app.include_router(customers.router)
+app.include_router(reports.router)
+
+
+def build_text_index():
+    db = SessionLocal()
+    try:
+        product_text_index.refresh(db)
+    finally:
+        db.close()
+
+
+# Built off the startup path; searches arriving before it finishes wait on the index lock.
+@app.on_event("startup")
+def start_text_index():
+    threading.Thread(target=build_text_index, daemon=True).start()
 
 
 @app.get("/api/health")
@@ -2,13 +2,16 @@ from datetime import datetime
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     ForeignKey,
     Integer,
     String,
     Text,
     Float,
+    Index,
     Table,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -54,6 +57,7 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (Index("idx_products_catalog_version", "catalog_version"),)
 
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
@@ -65,12 +69,18 @@ class Product(Base):
     remark_enabled = Column(Boolean, default=True)
     distributor_enabled = Column(Boolean, default=True)
     custom_order_code_enabled = Column(Boolean, default=True)
+    pricing_version = Column(Integer, nullable=False, default=1)
+    catalog_version = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     category = relationship("Category", back_populates="products")
     images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
     attributes = relationship(
-        "ProductAttribute", back_populates="product", cascade="all, delete-orphan"
+        "ProductAttribute",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        order_by="(ProductAttribute.sort_order, ProductAttribute.id)",
     )
 
 
@@ -95,7 +105,10 @@ class ProductAttribute(Base):
 
     product = relationship("Product", back_populates="attributes")
     options = relationship(
-        "ProductAttributeOption", back_populates="attribute", cascade="all, delete-orphan"
+        "ProductAttributeOption",
+        back_populates="attribute",
+        cascade="all, delete-orphan",
+        order_by="(ProductAttributeOption.sort_order, ProductAttributeOption.id)",
     )
 
 
@@ -108,6 +121,7 @@ class ProductAttributeOption(Base):
     price_delta = Column(Float, default=0)
     image_url = Column(String(255), nullable=True)
     is_default = Column(Boolean, default=False)
+    sort_order = Column(Integer, default=0)
 
     attribute = relationship("ProductAttribute", back_populates="options")
 
@@ -129,11 +143,32 @@ class Customer(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("idx_orders_created_at", "created_at", "id"),
+        Index("idx_orders_sales_created", "sales_id", "created_at", "id"),
+        Index("idx_orders_sales_status_created", "sales_id", "status", "created_at", "id"),
+        Index("idx_orders_sales_distributor_created", "sales_id", "distributor", "created_at", "id"),
+        Index("idx_orders_sales_product_created", "sales_id", "product_id", "created_at", "id"),
+        Index("idx_orders_status_created", "status", "created_at", "id"),
+        Index("idx_orders_product_created", "product_id", "created_at", "id"),
+        Index("idx_orders_distributor_created", "distributor", "created_at", "id"),
+        Index(
+            "ft_orders_search",
+            "order_code",
+            "custom_order_code",
+            "distributor",
+            "remark_text",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     order_code = Column(String(80), unique=True, nullable=False)
     sales_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_title = Column(String(200), nullable=True)
+    product_image_url = Column(String(255), nullable=True)
     status = Column(String(40), default="created")
     qty = Column(Integer, default=1)
     total_price = Column(Float, default=0)
@@ -162,6 +197,56 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
 
 
+class OrderSequence(Base):
+    __tablename__ = "order_sequences"
+    __table_args__ = (
+        UniqueConstraint("prefix", "category", "date_code", name="uq_order_sequences_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    prefix = Column(String(4), nullable=False)
+    category = Column(String(80), nullable=False)
+    date_code = Column(String(6), nullable=False)
+    last_value = Column(Integer, nullable=False, default=0)
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String(40), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ProductTombstone(Base):
+    __tablename__ = "product_tombstones"
+    __table_args__ = (Index("idx_product_tombstones_catalog_version", "catalog_version"),)
+
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    catalog_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OrderDailyStat(Base):
+    __tablename__ = "order_daily_stats"
+    __table_args__ = (
+        UniqueConstraint(
+            "stat_date", "sales_id", "product_id", "distributor", "status", name="uq_order_daily_stats_key"
+        ),
+        Index("idx_order_daily_stats_sales", "sales_id", "stat_date"),
+        Index("idx_order_daily_stats_product", "product_id", "stat_date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    stat_date = Column(Date, nullable=False)
+    sales_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    distributor = Column(String(120), nullable=False, default="")
+    status = Column(String(40), nullable=False, default="created")
+    order_count = Column(Integer, nullable=False, default=0)
+    qty = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float(53), nullable=False, default=0)
+
+
 class OperationLog(Base):
     __tablename__ = "operation_logs"
 
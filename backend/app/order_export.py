@@ -0,0 +1,50 @@
+import csv
+from io import StringIO
+from tempfile import TemporaryFile
+from typing import Iterable, Iterator
+
+from openpyxl import Workbook
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Same headers the import reads back; attribute columns follow these.
+EXPORT_HEADERS = [
+    "业务员",
+    "代理商",
+    "下单日期",
+    "订单号",
+    "自定义订单号",
+    "产品名称",
+    "产品品牌",
+    "材质",
+    "数量",
+    "总价",
+    "订单备注",
+]
+
+
+def csv_chunks(rows: Iterable[list]) -> Iterator[bytes]:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def xlsx_chunks(rows: Iterable[list]) -> Iterator[bytes]:
+    # Write-only workbooks spool rows to disk, so memory stays flat; the file can
+    # only be sent once the zip is complete.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("订单")
+    for row in rows:
+        sheet.append(row)
+    with TemporaryFile() as handle:
+        workbook.save(handle)
+        handle.seek(0)
+        while chunk := handle.read(EXPORT_CHUNK_SIZE):
+            yield chunk
@@ -0,0 +1,85 @@
+import csv
+from io import BytesIO, StringIO
+from typing import Iterator
+
+from openpyxl import load_workbook
+
+MAX_IMPORT_LINES = 5000
+
+# Column headers accepted in import files. The Chinese headers match the order
+# export, so an exported sheet can be edited and imported again.
+IMPORT_COLUMNS = {
+    "产品ID": "product_id",
+    "product_id": "product_id",
+    "产品名称": "product_title",
+    "product_title": "product_title",
+    "数量": "qty",
+    "qty": "qty",
+    "代理商": "distributor",
+    "distributor": "distributor",
+    "自定义订单号": "custom_order_code",
+    "custom_order_code": "custom_order_code",
+    "订单备注": "remark_text",
+    "remark_text": "remark_text",
+}
+IGNORED_COLUMNS = {"业务员", "下单日期", "订单号", "产品品牌", "材质", "单价", "总价"}
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(filename: str, content: bytes) -> Iterator[tuple[int, dict]]:
+    # Yields (line number, {header: text}) for every non-blank data row.
+    suffix = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if suffix == "xlsx":
+        try:
+            workbook = load_workbook(BytesIO(content), read_only=True, data_only=True)
+        except Exception as exc:
+            raise ImportFileError("无法读取 Excel 文件") from exc
+        rows = workbook.active.iter_rows(values_only=True)
+    elif suffix == "csv":
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = content.decode("gb18030", errors="replace")
+        rows = csv.reader(StringIO(text))
+    else:
+        raise ImportFileError("仅支持 CSV 或 XLSX 文件")
+    headers = None
+    for line, row in enumerate(rows, start=1):
+        values = [cell_text(value) for value in row]
+        if headers is None:
+            headers = values
+            continue
+        if not any(values):
+            continue
+        yield line, dict(zip(headers, values))
+
+
+def row_to_line(row: dict) -> dict:
+    # Known headers become order fields; any other column is read as
+    # attribute name -> option label.
+    line = {"options": {}}
+    for header, value in row.items():
+        if not header or not value or header in IGNORED_COLUMNS:
+            continue
+        field = IMPORT_COLUMNS.get(header)
+        if field is None:
+            line["options"][header] = value
+        elif field in {"product_id", "qty"}:
+            try:
+                line[field] = int(float(value))
+            except ValueError:
+                raise ImportFileError(f"「{header}」不是有效数字")
+        else:
+            line[field] = value
+    return line
@@ -0,0 +1,151 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, selectinload
+
+from .models import Product, ProductAttribute
+
+
+@dataclass(frozen=True)
+class PricedOption:
+    id: int
+    attribute_id: int
+    attribute_name: str
+    label: str
+    price_delta: float
+    image_url: Optional[str]
+
+
+@dataclass(frozen=True)
+class PricedAttribute:
+    id: int
+    name: str
+    default_option_id: Optional[int]
+
+
+@dataclass
+class PricingTable:
+    product_id: int
+    version: int
+    base_price: float
+    attributes: list = field(default_factory=list)
+    options: dict = field(default_factory=dict)
+    labels: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_product(cls, product: Product) -> "PricingTable":
+        table = cls(
+            product_id=product.id,
+            version=product.pricing_version,
+            base_price=product.base_price or 0,
+        )
+        for attribute in sorted(product.attributes, key=lambda item: (item.sort_order or 0, item.id)):
+            default_option_id = None
+            for option in attribute.options:
+                table.options[option.id] = PricedOption(
+                    id=option.id,
+                    attribute_id=attribute.id,
+                    attribute_name=attribute.name,
+                    label=option.label,
+                    price_delta=option.price_delta or 0,
+                    image_url=option.image_url,
+                )
+                table.labels[(attribute.name, option.label)] = option.id
+                if option.is_default and default_option_id is None:
+                    default_option_id = option.id
+            table.attributes.append(
+                PricedAttribute(
+                    id=attribute.id,
+                    name=attribute.name,
+                    default_option_id=default_option_id,
+                )
+            )
+        return table
+
+    def option_ids(self, labels: dict) -> list[int]:
+        # Maps {attribute name: option label}, as used in spreadsheets, to option ids.
+        option_ids = []
+        for name, label in labels.items():
+            option_id = self.labels.get((name, label))
+            if option_id is None:
+                raise HTTPException(status_code=400, detail=f"属性「{name}」没有选项「{label}」")
+            option_ids.append(option_id)
+        return option_ids
+
+    def resolve(self, option_ids: list[int]) -> list[PricedOption]:
+        # One option per attribute, all belonging to this product; attributes left
+        # out fall back to their default option.
+        chosen = {}
+        for option_id in option_ids:
+            option = self.options.get(option_id)
+            if option is None:
+                raise HTTPException(status_code=400, detail="属性选项不属于该产品")
+            if chosen.get(option.attribute_id, option_id) != option_id:
+                raise HTTPException(status_code=400, detail=f"属性「{option.attribute_name}」只能选择一个选项")
+            chosen[option.attribute_id] = option_id
+        resolved = []
+        for attribute in self.attributes:
+            option_id = chosen.get(attribute.id, attribute.default_option_id)
+            if option_id is None:
+                raise HTTPException(status_code=400, detail="属性选项不完整")
+            resolved.append(self.options[option_id])
+        return resolved
+
+    def quote(self, option_ids: list[int], qty: int) -> dict:
+        options = self.resolve(option_ids)
+        unit_price = self.base_price + sum(option.price_delta for option in options)
+        return {
+            "product_id": self.product_id,
+            "qty": qty,
+            "base_price": self.base_price,
+            "unit_price": unit_price,
+            "total_price": unit_price * qty,
+            "items": [
+                {
+                    "attribute_id": option.attribute_id,
+                    "attribute_name": option.attribute_name,
+                    "option_id": option.id,
+                    "option_label": option.label,
+                    "price_delta": option.price_delta,
+                    "option_image_url": option.image_url,
+                }
+                for option in options
+            ],
+        }
+
+
+class PricingCache:
+    # Tables are keyed by product id and checked against products.pricing_version,
+    # which every product write bumps, so other workers' edits are picked up too.
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, product_id: int) -> PricingTable:
+        version = db.query(Product.pricing_version).filter(Product.id == product_id).scalar()
+        if version is None:
+            raise HTTPException(status_code=404, detail="产品不存在")
+        with self._lock:
+            table = self._tables.get(product_id)
+        if table is not None and table.version == version:
+            return table
+        product = (
+            db.query(Product)
+            .options(selectinload(Product.attributes).selectinload(ProductAttribute.options))
+            .filter(Product.id == product_id)
+            .first()
+        )
+        table = PricingTable.from_product(product)
+        with self._lock:
+            self._tables[product_id] = table
+        return table
+
+    def invalidate(self, product_id: int) -> None:
+        with self._lock:
+            self._tables.pop(product_id, None)
+
+
+pricing_tables = PricingCache()
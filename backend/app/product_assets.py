@@ -0,0 +1,109 @@
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from .models import ProductAttribute, ProductAttributeOption, ProductImage
+from .schemas import ProductAssetPayload
+
+
+def apply_row_changes(db: Session, model, updates: list[dict], inserts: list[dict], removed: set) -> None:
+    # One executemany per kind of change; unchanged rows are never written.
+    if removed:
+        db.execute(delete(model).where(model.id.in_(removed)), execution_options={"synchronize_session": False})
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+
+
+def changed_values(row, values: dict) -> dict:
+    return {key: value for key, value in values.items() if getattr(row, key) != value}
+
+
+def match_row(existing: dict, natural_ids: dict, claimed: set, row_id, natural_key):
+    # Payload ids win; entries sent without a known id fall back to the natural
+    # key (image url, attribute name, option label) so resubmitted rows keep their ids.
+    if row_id in existing and row_id not in claimed:
+        return row_id
+    if row_id is None:
+        fallback = natural_ids.get(natural_key)
+        if fallback is not None and fallback not in claimed:
+            return fallback
+    return None
+
+
+def sync_images(db: Session, product_id: int, payload: ProductAssetPayload) -> None:
+    existing = {row.id: row for row in db.query(ProductImage).filter(ProductImage.product_id == product_id)}
+    natural_ids = {}
+    for row in existing.values():
+        natural_ids.setdefault(row.image_url, row.id)
+    claimed, updates, inserts = set(), [], []
+    for item in payload.images:
+        values = {"image_url": item.image_url, "is_primary": item.is_primary}
+        image_id = match_row(existing, natural_ids, claimed, item.id, item.image_url)
+        if image_id is None:
+            inserts.append({"product_id": product_id, **values})
+            continue
+        claimed.add(image_id)
+        if changed := changed_values(existing[image_id], values):
+            updates.append({"id": image_id, **changed})
+    apply_row_changes(db, ProductImage, updates, inserts, set(existing) - claimed)
+
+
+def sync_attributes(db: Session, product_id: int, payload: ProductAssetPayload, keep_prices: bool) -> None:
+    # keep_prices: roles without price access keep stored deltas and add new options at 0.
+    attributes = {
+        row.id: row for row in db.query(ProductAttribute).filter(ProductAttribute.product_id == product_id)
+    }
+    options = {}
+    if attributes:
+        options = {
+            row.id: row
+            for row in db.query(ProductAttributeOption).filter(
+                ProductAttributeOption.attribute_id.in_(attributes)
+            )
+        }
+    attribute_names = {}
+    for row in attributes.values():
+        attribute_names.setdefault(row.name, row.id)
+    option_labels = {}
+    for row in options.values():
+        option_labels.setdefault((row.attribute_id, row.label), row.id)
+
+    claimed_attributes, attribute_updates, claimed_options, option_updates, option_inserts = set(), [], set(), [], []
+    for attribute in payload.attributes:
+        values = {"name": attribute.name, "sort_order": attribute.sort_order}
+        attribute_id = match_row(attributes, attribute_names, claimed_attributes, attribute.id, attribute.name)
+        if attribute_id is None:
+            row = ProductAttribute(product_id=product_id, **values)
+            db.add(row)
+            db.flush()
+            attribute_id = row.id
+        else:
+            if changed := changed_values(attributes[attribute_id], values):
+                attribute_updates.append({"id": attribute_id, **changed})
+        claimed_attributes.add(attribute_id)
+
+        for sort_order, option in enumerate(attribute.options):
+            option_id = match_row(
+                options, option_labels, claimed_options, option.id, (attribute_id, option.label)
+            )
+            price_delta = option.price_delta if option.price_delta is not None else 0
+            if keep_prices:
+                price_delta = options[option_id].price_delta if option_id is not None else 0
+            values = {
+                "attribute_id": attribute_id,
+                "label": option.label,
+                "price_delta": price_delta,
+                "image_url": option.image_url,
+                "is_default": option.is_default,
+                "sort_order": sort_order,
+            }
+            if option_id is None:
+                option_inserts.append(values)
+                continue
+            claimed_options.add(option_id)
+            if changed := changed_values(options[option_id], values):
+                option_updates.append({"id": option_id, **changed})
+
+    apply_row_changes(db, ProductAttributeOption, option_updates, option_inserts, set(options) - claimed_options)
+    apply_row_changes(db, ProductAttribute, attribute_updates, [], set(attributes) - claimed_attributes)
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+from .vector_search import normalize_rows
+
+MAX_BATCH_SIZE = int(os.getenv("IMAGE_SEARCH_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("IMAGE_SEARCH_MAX_WAIT_MS", "10"))
+MAX_QUEUE_SIZE = int(os.getenv("IMAGE_SEARCH_QUEUE_SIZE", "64"))
+CACHE_SIZE = int(os.getenv("IMAGE_SEARCH_CACHE_SIZE", "256"))
+
+
+class EmbeddingCache:
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class QueryEncoder:
+    # Concurrent searches are coalesced into micro-batches so the encoder runs once
+    # per batch instead of once per request. Index builds share the same model via
+    # encode(); the model lock keeps those calls from overlapping with search batches.
+
+    def __init__(
+        self,
+        load_model: Callable,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+    ):
+        self._load_model = load_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+    def encode(self, images: list, batch_size: Optional[int] = None) -> np.ndarray:
+        with self._model_lock:
+            return self._load_model().encode(images, batch_size=batch_size or len(images))
+
+    def submit(self, image: Image.Image) -> Future:
+        # Raises queue.Full when the encoder is saturated so callers can shed load.
+        self._ensure_started()
+        future = Future()
+        self._queue.put_nowait((image, future))
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode(batch)
+
+    def _encode(self, batch: list) -> None:
+        batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            images = [image for image, _ in batch]
+            vectors = normalize_rows(self.encode(images))
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
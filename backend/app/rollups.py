@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from .models import Order, OrderDailyStat
+
+STAT_KEY = ("stat_date", "sales_id", "product_id", "distributor", "status")
+REBUILD_BATCH_SIZE = 1000
+
+
+def order_value(order, name: str):
+    # Orders arrive as ORM objects or as row dicts from a bulk insert.
+    return order.get(name) if isinstance(order, dict) else getattr(order, name)
+
+
+def order_stat_key(order) -> tuple:
+    created_at = order_value(order, "created_at") or datetime.utcnow()
+    return (
+        created_at.date(),
+        order_value(order, "sales_id"),
+        order_value(order, "product_id"),
+        order_value(order, "distributor") or "",
+        order_value(order, "status") or "created",
+    )
+
+
+def order_stat_deltas(orders: Iterable, sign: int = 1, deltas: Optional[dict] = None) -> dict:
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0, 0.0])
+    for order in orders:
+        delta = deltas[order_stat_key(order)]
+        delta[0] += sign
+        delta[1] += sign * (order_value(order, "qty") or 0)
+        delta[2] += sign * (order_value(order, "total_price") or 0)
+    return deltas
+
+
+def apply_stat_deltas(db: Session, deltas: dict) -> None:
+    # Runs inside the caller's transaction so the rollup commits with the orders
+    # (orders and order_daily_stats are both InnoDB).
+    rows = [
+        dict(zip(STAT_KEY, key), order_count=count, qty=qty, revenue=revenue)
+        for key, (count, qty, revenue) in deltas.items()
+        if count or qty or revenue
+    ]
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "mysql":
+        statement = mysql_insert(OrderDailyStat)
+        db.execute(
+            statement.on_duplicate_key_update(
+                order_count=OrderDailyStat.__table__.c.order_count + statement.inserted.order_count,
+                qty=OrderDailyStat.__table__.c.qty + statement.inserted.qty,
+                revenue=OrderDailyStat.__table__.c.revenue + statement.inserted.revenue,
+            ),
+            rows,
+        )
+    else:
+        for row in rows:
+            updated = (
+                db.query(OrderDailyStat)
+                .filter_by(**{name: row[name] for name in STAT_KEY})
+                .update(
+                    {
+                        OrderDailyStat.order_count: OrderDailyStat.order_count + row["order_count"],
+                        OrderDailyStat.qty: OrderDailyStat.qty + row["qty"],
+                        OrderDailyStat.revenue: OrderDailyStat.revenue + row["revenue"],
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated == 0:
+                db.add(OrderDailyStat(**row))
+        db.flush()
+    # Status changes and deletes empty out groups; drop them so reports never show
+    # zero-order rows. Only the exact keys just decremented are matched, so the
+    # delete locks those rows instead of ranges of the day.
+    emptied_keys = [tuple(row[name] for name in STAT_KEY) for row in rows if row["order_count"] < 0]
+    if emptied_keys:
+        columns = [getattr(OrderDailyStat, name) for name in STAT_KEY]
+        db.query(OrderDailyStat).filter(
+            tuple_(*columns).in_(emptied_keys), OrderDailyStat.order_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def record_orders(db: Session, orders: Iterable, sign: int = 1) -> None:
+    apply_stat_deltas(db, order_stat_deltas(orders, sign))
+
+
+def rebuild_order_stats(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+    # Recomputes the rollup from the orders table for the given day range (inclusive).
+    stat_date = func.date(Order.created_at)
+    distributor = func.coalesce(Order.distributor, "")
+    status = func.coalesce(Order.status, "created")
+    stats = db.query(OrderDailyStat)
+    orders = db.query(
+        stat_date,
+        Order.sales_id,
+        Order.product_id,
+        distributor,
+        status,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.qty), 0),
+        func.coalesce(func.sum(Order.total_price), 0),
+    ).filter(Order.created_at.isnot(None))
+    if date_from:
+        stats = stats.filter(OrderDailyStat.stat_date >= date_from)
+        orders = orders.filter(stat_date >= date_from)
+    if date_to:
+        stats = stats.filter(OrderDailyStat.stat_date <= date_to)
+        orders = orders.filter(stat_date <= date_to)
+    stats.delete(synchronize_session=False)
+    rows = []
+    total = 0
+    grouped = orders.group_by(stat_date, Order.sales_id, Order.product_id, distributor, status)
+    for day, sales_id, product_id, distributor_name, status_name, count, qty, revenue in grouped:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        rows.append(
+            {
+                "stat_date": day,
+                "sales_id": sales_id,
+                "product_id": product_id,
+                "distributor": distributor_name,
+                "status": status_name,
+                "order_count": count,
+                "qty": qty,
+                "revenue": revenue,
+            }
+        )
+        if len(rows) >= REBUILD_BATCH_SIZE:
+            db.execute(insert(OrderDailyStat), rows)
+            total += len(rows)
+            rows = []
+    if rows:
+        db.execute(insert(OrderDailyStat), rows)
+        total += len(rows)
+    db.commit()
+    return total
@@ -1,15 +1,74 @@
-from datetime import datetime
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import case, func, insert, or_, tuple_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 from ..auth import require_role
-from ..database import get_db
-from ..models import Customer, OperationLog, Order, OrderItem, Product, ProductAttributeOption, User
-from ..schemas import OrderCreate, OrderRead, OrderUpdate
+from ..database import SessionLocal, get_db
+from ..models import (
+    Customer,
+    OperationLog,
+    Order,
+    OrderItem,
+    OrderSequence,
+    Product,
+    ProductAttribute,
+    User,
+)
+from ..order_export import EXPORT_HEADERS, csv_chunks, xlsx_chunks
+from ..order_import import MAX_IMPORT_LINES, ImportFileError, read_rows, row_to_line
+from ..pagination import decode_cursor, encode_cursor
+from ..pricing import pricing_tables
+from ..rollups import apply_stat_deltas, order_stat_deltas, record_orders
+from ..schemas import (
+    OrderBulkDelete,
+    OrderBulkStatus,
+    OrderCreate,
+    OrderImportLine,
+    OrderImportResult,
+    OrderPage,
+    OrderQuoteRead,
+    OrderQuoteRequest,
+    OrderRead,
+    OrderSearchPage,
+    OrderSummaryPage,
+    OrderUpdate,
+)
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
+ORDER_STATUSES = ("created", "confirmed", "producing", "shipped", "completed", "cancelled")
+MAX_BULK_ORDERS = 1000
+EXPORT_BATCH_SIZE = 1000
+NGRAM_TOKEN_SIZE = 2
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+# Each search query (code prefix, text match) reads at most this many orders.
+MAX_SEARCH_MATCHES = 5000
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Hydrates everything OrderRead serializes in a fixed number of queries per page
+# instead of lazy-loading the product graph order by order.
+ORDER_READ_OPTIONS = (
+    joinedload(Order.sales),
+    selectinload(Order.items),
+    selectinload(Order.product).joinedload(Product.category),
+    selectinload(Order.product).selectinload(Product.images),
+    selectinload(Order.product)
+    .selectinload(Product.attributes)
+    .selectinload(ProductAttribute.options),
+)
+# Summaries read the product snapshot stored on the order, never the product graph.
+ORDER_SUMMARY_OPTIONS = (joinedload(Order.sales), selectinload(Order.items))
+
 
 def mask_order_prices(orders: list[Order]) -> list[Order]:
     for order in orders:
@@ -21,6 +80,29 @@ def mask_order_prices(orders: list[Order]) -> list[Order]:
     return orders
 
 
+def load_order(db: Session, order_id: int) -> Optional[Order]:
+    return db.query(Order).options(*ORDER_READ_OPTIONS).filter(Order.id == order_id).first()
+
+
+def product_snapshot(product: Product) -> tuple[str, Optional[str]]:
+    primary = next((image for image in product.images if image.is_primary), None)
+    if primary is None and product.images:
+        primary = product.images[0]
+    return product.title, primary.image_url if primary else None
+
+
+def order_items(quote: dict) -> list[OrderItem]:
+    return [
+        OrderItem(
+            attribute_name=item["attribute_name"],
+            option_label=item["option_label"],
+            price_delta=item["price_delta"],
+            option_image_url=item["option_image_url"],
+        )
+        for item in quote["items"]
+    ]
+
+
 def validate_distributor(db: Session, user: User, distributor: Optional[str]) -> Optional[str]:
     if not distributor:
         return None
@@ -32,37 +114,316 @@ def validate_distributor(db: Session, user: User, distributor: Optional[str]) ->
     return distributor
 
 
-def build_order_code(db: Session, user: User, product: Product) -> str:
+def escape_like(value: str) -> str:
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def seed_order_sequence(db: Session, code_prefix: str) -> int:
+    # Only runs once per key and day: continues after codes issued before the
+    # sequence row existed. The LIKE prefix is a range scan on the order_code index.
+    last = 0
+    pattern = escape_like(code_prefix)
+    codes = db.query(Order.order_code).filter(Order.order_code.like(f"{pattern}-%", escape="/"))
+    for (code,) in codes:
+        suffix = code[len(code_prefix) + 1 :]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    return last
+
+
+def next_order_sequence(db: Session, prefix: str, category: str, date_code: str, count: int = 1) -> int:
+    # Reserves `count` consecutive numbers and returns the last one.
+    key = {"prefix": prefix, "category": category, "date_code": date_code}
+    sequences = db.query(OrderSequence).filter_by(**key)
+    if db.query(sequences.exists()).scalar():
+        first_value = count
+    else:
+        first_value = seed_order_sequence(db, f"{prefix}-{category}-{date_code}") + count
+    if db.get_bind().dialect.name == "mysql":
+        # The upsert row-locks the key until commit, so concurrent creates serialize.
+        statement = mysql_insert(OrderSequence).values(**key, last_value=first_value)
+        db.execute(
+            statement.on_duplicate_key_update(last_value=OrderSequence.__table__.c.last_value + count)
+        )
+    elif sequences.update(
+        {OrderSequence.last_value: OrderSequence.last_value + count}, synchronize_session=False
+    ) == 0:
+        db.add(OrderSequence(**key, last_value=first_value))
+        db.flush()
+    return db.query(OrderSequence.last_value).filter_by(**key).scalar()
+
+
+def build_order_codes(db: Session, user: User, product: Product, count: int = 1) -> list[str]:
     prefix = user.order_prefix or "SA"
     category = product.category.name if product.category else "UNCAT"
     date_code = datetime.utcnow().strftime("%y%m%d")
-    existing_codes = (
-        db.query(Order.order_code)
-        .filter(
-            Order.sales_id == user.id,
-            func.date(Order.created_at) == datetime.utcnow().date(),
+    last = next_order_sequence(db, prefix, category, date_code, count)
+    return [f"{prefix}-{category}-{date_code}-{seq:03d}" for seq in range(last - count + 1, last + 1)]
+
+
+def build_order_code(db: Session, user: User, product: Product) -> str:
+    return build_order_codes(db, user, product)[0]
+
+
+def filter_orders(
+    query,
+    user: User,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    distributor: Optional[str] = None,
+    product_id: Optional[int] = None,
+    sales_id: Optional[int] = None,
+):
+    # Every filter is an equality followed by (created_at, id), matching the composite
+    # idx_orders_* indexes; sales users are always scoped by sales_id, so their
+    # status, distributor and product filters have sales_id-leading indexes too.
+    if user.role == "sales":
+        query = query.filter(Order.sales_id == user.id)
+    elif sales_id is not None:
+        query = query.filter(Order.sales_id == sales_id)
+    if status:
+        query = query.filter(Order.status == status)
+    if distributor:
+        query = query.filter(Order.distributor == distributor)
+    if product_id is not None:
+        query = query.filter(Order.product_id == product_id)
+    if date_from:
+        query = query.filter(Order.created_at >= date_from)
+    if date_to:
+        query = query.filter(Order.created_at < date_to + timedelta(days=1))
+    return query
+
+
+def order_page(query, cursor: Optional[str], limit: int, include_total: bool, options: tuple) -> dict:
+    total = query.count() if include_total else None
+    if cursor:
+        query = query.filter(tuple_(Order.created_at, Order.id) < decode_cursor(cursor))
+    orders = query.options(*options).order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return {"items": orders[:limit], "next_cursor": next_cursor, "total": total}
+
+
+@router.get("", response_model=OrderPage)
+def list_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    distributor: Optional[str] = None,
+    product_id: Optional[int] = None,
+    sales_id: Optional[int] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    query = filter_orders(
+        db.query(Order), user, status, date_from, date_to, distributor, product_id, sales_id
+    )
+    page = order_page(query, cursor, limit, include_total, ORDER_READ_OPTIONS)
+    if user.role not in {"admin", "finance"}:
+        mask_order_prices(page["items"])
+    return page
+
+
+@router.get("/summary", response_model=OrderSummaryPage)
+def list_order_summaries(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    distributor: Optional[str] = None,
+    product_id: Optional[int] = None,
+    sales_id: Optional[int] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    query = filter_orders(
+        db.query(Order), user, status, date_from, date_to, distributor, product_id, sales_id
+    )
+    return order_page(query, cursor, limit, include_total, ORDER_SUMMARY_OPTIONS)
+
+
+def order_search_matches(db: Session, user: User, q: str) -> list:
+    # Returns (code prefix hit, relevance, created_at, id) for the matching orders,
+    # best first. The code-prefix lookup and the text match run as separate queries so
+    # each uses its own index (OR-ing them makes MySQL skip the FULLTEXT index and scan
+    # the table); the ids are merged here. On MySQL the ngram FULLTEXT index runs in
+    # boolean mode, which has no 50% threshold (natural-language mode drops terms such
+    # as "SA" that occur in most order codes); single characters are shorter than an
+    # ngram token and only match code prefixes.
+    prefix = f"{escape_like(q)}%"
+    code_match = or_(
+        Order.order_code.like(prefix, escape="/"), Order.custom_order_code.like(prefix, escape="/")
+    )
+    text_score = None
+    if db.get_bind().dialect.name == "mysql":
+        terms = BOOLEAN_OPERATORS.sub(" ", q).strip()
+        if len(terms) >= NGRAM_TOKEN_SIZE:
+            text_score = match(
+                Order.order_code,
+                Order.custom_order_code,
+                Order.distributor,
+                Order.remark_text,
+                against=terms,
+            ).in_boolean_mode()
+            text_match = text_score > 0
+    else:
+        contains = f"%{escape_like(q)}%"
+        columns = (Order.order_code, Order.custom_order_code, Order.distributor, Order.remark_text)
+        text_score = sum(case((column.like(contains, escape="/"), 1), else_=0) for column in columns)
+        text_match = or_(*(column.like(contains, escape="/") for column in columns))
+
+    matches = {}
+    code_rows = (
+        filter_orders(db.query(Order.id, Order.created_at), user)
+        .filter(code_match)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(MAX_SEARCH_MATCHES)
+    )
+    for order_id, created_at in code_rows:
+        matches[order_id] = [1, 0, created_at or datetime.min, order_id]
+    if text_score is not None:
+        text_rows = (
+            filter_orders(db.query(Order.id, Order.created_at, text_score), user)
+            .filter(text_match)
+            .order_by(text_score.desc())
+            .limit(MAX_SEARCH_MATCHES)
         )
-        .all()
+        for order_id, created_at, score in text_rows:
+            matches.setdefault(order_id, [0, 0, created_at or datetime.min, order_id])[1] = score
+    return sorted(matches.values(), reverse=True)
+
+
+@router.get("/search", response_model=OrderSearchPage)
+def search_orders(
+    q: str = Query(..., min_length=1, max_length=100),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    q = q.strip()
+    if not q:
+        return {"items": [], "total": 0, "page": page, "page_size": page_size}
+    matches = order_search_matches(db, user, q)
+    page_ids = [order_id for *_, order_id in matches[(page - 1) * page_size : page * page_size]]
+    orders = {
+        order.id: order
+        for order in db.query(Order).options(*ORDER_SUMMARY_OPTIONS).filter(Order.id.in_(page_ids))
+    }
+    items = [orders[order_id] for order_id in page_ids if order_id in orders]
+    return {"items": items, "total": len(matches), "page": page, "page_size": page_size}
+
+
+def export_order_rows(user: User, filters: dict):
+    # Runs after the request's session is closed, so it owns its session. Rows come
+    # off an unbuffered cursor one order/item pair at a time and are folded into one
+    # line per order.
+    db = SessionLocal()
+    try:
+        attribute_names = sorted(
+            name
+            for (name,) in filter_orders(
+                db.query(OrderItem.attribute_name).join(Order, OrderItem.order_id == Order.id), user, **filters
+            ).distinct()
+        )
+        yield EXPORT_HEADERS + attribute_names
+        query = filter_orders(
+            db.query(
+                Order.id,
+                User.name,
+                Order.distributor,
+                Order.created_at,
+                Order.order_code,
+                Order.custom_order_code,
+                func.coalesce(Order.product_title, Product.title),
+                Product.brand,
+                Product.material,
+                Order.qty,
+                Order.total_price,
+                Order.remark_text,
+                OrderItem.attribute_name,
+                OrderItem.option_label,
+            )
+            .outerjoin(User, Order.sales_id == User.id)
+            .outerjoin(Product, Order.product_id == Product.id)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id),
+            user,
+            **filters,
+        )
+        rows = query.order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id).yield_per(EXPORT_BATCH_SIZE)
+        current_id = None
+        line = None
+        options = {}
+        for row in rows:
+            if row[0] != current_id:
+                if line is not None:
+                    yield line + [options.get(name, "") for name in attribute_names]
+                current_id = row[0]
+                created_at = row[3].strftime("%Y-%m-%d %H:%M") if row[3] else ""
+                line = [row[1], row[2], created_at, *row[4:12]]
+                options = {}
+            if row[12] is not None:
+                options[row[12]] = row[13]
+        if line is not None:
+            yield line + [options.get(name, "") for name in attribute_names]
+    finally:
+        db.close()
+
+
+@router.get("/export")
+def export_orders(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    distributor: Optional[str] = None,
+    product_id: Optional[int] = None,
+    sales_id: Optional[int] = None,
+    user=Depends(require_role("sales", "admin", "finance")),
+):
+    filters = {
+        "status": status,
+        "date_from": date_from,
+        "date_to": date_to,
+        "distributor": distributor,
+        "product_id": product_id,
+        "sales_id": sales_id,
+    }
+    rows = export_order_rows(user, filters)
+    chunks = xlsx_chunks(rows) if format == "xlsx" else csv_chunks(rows)
+    filename = f"orders-{datetime.utcnow():%Y%m%d%H%M}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    seq = 1
-    if existing_codes:
-        parsed = []
-        for (code,) in existing_codes:
-            parts = code.split("-")
-            if len(parts) == 4 and parts[-1].isdigit():
-                parsed.append(int(parts[-1]))
-        if parsed:
-            seq = max(parsed) + 1
-    return f"{prefix}-{category}-{date_code}-{seq:03d}"
-
-
-@router.get("", response_model=list[OrderRead])
-def list_orders(db: Session = Depends(get_db), user=Depends(require_role("sales", "admin"))):
-    query = db.query(Order).filter(Order.sales_id == user.id) if user.role == "sales" else db.query(Order)
-    orders = query.order_by(Order.created_at.desc()).all()
+
+
+@router.get("/{order_id}", response_model=OrderRead)
+def get_order(order_id: int, db: Session = Depends(get_db), user=Depends(require_role("sales", "admin"))):
+    order = load_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="订单不存在")
+    if user.role == "sales" and order.sales_id != user.id:
+        raise HTTPException(status_code=403, detail="无权限")
     if user.role not in {"admin", "finance"}:
-        return mask_order_prices(orders)
-    return orders
+        mask_order_prices([order])
+    return order
+
+
+@router.post("/quote", response_model=OrderQuoteRead)
+def quote_order(payload: OrderQuoteRequest, db: Session = Depends(get_db), user=Depends(require_role("sales", "admin"))):
+    quote = pricing_tables.get(db, payload.product_id).quote(payload.selected_options, payload.qty)
+    if user.role not in {"admin", "finance"}:
+        quote["base_price"] = None
+        for item in quote["items"]:
+            item["price_delta"] = None
+    return quote
 
 
 @router.post("", response_model=OrderRead)
@@ -70,42 +431,29 @@ def create_order(payload: OrderCreate, db: Session = Depends(get_db), user=Depen
     product = db.query(Product).filter(Product.id == payload.product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="产品不存在")
-    options = (
-        db.query(ProductAttributeOption)
-        .filter(ProductAttributeOption.id.in_(payload.selected_options))
-        .all()
-    )
-    if len(options) != len(payload.selected_options):
-        raise HTTPException(status_code=400, detail="属性选项不完整")
-    total_price = product.base_price + sum(option.price_delta for option in options)
-    total_price *= payload.qty
+    quote = pricing_tables.get(db, product.id).quote(payload.selected_options, payload.qty)
     remark_image_url = payload.remark_image_url
     if payload.remark_images:
         remark_image_url = ",".join(payload.remark_images)
     distributor = validate_distributor(db, user, payload.distributor)
+    product_title, product_image_url = product_snapshot(product)
     order = Order(
         order_code=build_order_code(db, user, product),
         sales_id=user.id,
         product_id=product.id,
+        product_title=product_title,
+        product_image_url=product_image_url,
         qty=payload.qty,
-        total_price=total_price,
+        total_price=quote["total_price"],
         distributor=distributor,
         custom_order_code=payload.custom_order_code,
         remark_text=payload.remark_text,
         remark_image_url=remark_image_url,
     )
+    order.items = order_items(quote)
     db.add(order)
     db.flush()
-    for option in options:
-        db.add(
-            OrderItem(
-                order_id=order.id,
-                attribute_name=option.attribute.name,
-                option_label=option.label,
-                price_delta=option.price_delta,
-                option_image_url=option.image_url,
-            )
-        )
+    record_orders(db, [order])
     db.add(
         OperationLog(
             user_id=user.id,
@@ -115,8 +463,226 @@ def create_order(payload: OrderCreate, db: Session = Depends(get_db), user=Depen
         )
     )
     db.commit()
-    db.refresh(order)
-    return order
+    return load_order(db, order.id)
+
+
+def bulk_order_logs(user: User, action: str, details: list[str]) -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {"user_id": user.id, "role": user.role, "action": action, "detail": detail, "created_at": now}
+        for detail in details
+    ]
+
+
+def create_orders_bulk(db: Session, user: User, lines: list, errors: list) -> dict:
+    # Validates every line before writing anything, then inserts orders, items and
+    # logs as three executemany statements in one transaction. orders, order_items and
+    # operation_logs are InnoDB, so a failed batch also rolls back its order_sequences block.
+    product_ids = {line.product_id for _, line in lines if line.product_id}
+    titles = {line.product_title for _, line in lines if not line.product_id and line.product_title}
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.category), selectinload(Product.images))
+        .filter(or_(Product.id.in_(product_ids), Product.title.in_(titles)))
+        .all()
+    )
+    products_by_id = {product.id: product for product in products}
+    # Titles are not unique; a title naming several products must be imported by id.
+    products_by_title = defaultdict(list)
+    for product in products:
+        products_by_title[product.title].append(product)
+    distributors = {line.distributor for _, line in lines if line.distributor}
+    known_customers = {
+        name for (name,) in db.query(Customer.full_name).filter(Customer.full_name.in_(distributors))
+    }
+    if user.role == "sales":
+        allowed_customers = {customer.full_name for customer in user.assigned_customers}
+    else:
+        allowed_customers = known_customers
+    tables = {}
+    prepared = []
+    for line_no, line in lines:
+        try:
+            if line.product_id:
+                product = products_by_id.get(line.product_id)
+            else:
+                matches = products_by_title.get(line.product_title, [])
+                if len(matches) > 1:
+                    raise HTTPException(
+                        status_code=400, detail=f"产品名称「{line.product_title}」对应多个产品，请填写产品ID"
+                    )
+                product = matches[0] if matches else None
+            if product is None:
+                raise HTTPException(status_code=404, detail="产品不存在")
+            if line.qty < 1:
+                raise HTTPException(status_code=400, detail="数量必须大于 0")
+            if line.distributor and line.distributor not in known_customers:
+                raise HTTPException(status_code=400, detail="客户不存在")
+            if line.distributor and line.distributor not in allowed_customers:
+                raise HTTPException(status_code=403, detail="无权限选择该客户")
+            if product.id not in tables:
+                tables[product.id] = pricing_tables.get(db, product.id)
+            table = tables[product.id]
+            quote = table.quote(line.selected_options + table.option_ids(line.options), line.qty)
+        except HTTPException as exc:
+            errors.append({"line": line_no, "detail": exc.detail})
+            continue
+        prepared.append((product, line, quote))
+    if errors:
+        raise HTTPException(status_code=400, detail=sorted(errors, key=lambda error: error["line"]))
+    if not prepared:
+        raise HTTPException(status_code=400, detail="没有可导入的订单")
+
+    groups = defaultdict(list)
+    for index, (product, _, _) in enumerate(prepared):
+        groups[product.category_id].append(index)
+    codes = [None] * len(prepared)
+    for indexes in groups.values():
+        block = build_order_codes(db, user, prepared[indexes[0]][0], len(indexes))
+        for index, code in zip(indexes, block):
+            codes[index] = code
+
+    now = datetime.utcnow()
+    order_rows = []
+    for code, (product, line, quote) in zip(codes, prepared):
+        product_title, product_image_url = product_snapshot(product)
+        order_rows.append(
+            {
+                "order_code": code,
+                "sales_id": user.id,
+                "product_id": product.id,
+                "product_title": product_title,
+                "product_image_url": product_image_url,
+                "qty": line.qty,
+                "total_price": quote["total_price"],
+                "distributor": line.distributor,
+                "custom_order_code": line.custom_order_code,
+                "remark_text": line.remark_text,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    db.execute(insert(Order), order_rows)
+    order_ids = dict(db.query(Order.order_code, Order.id).filter(Order.order_code.in_(codes)))
+    item_rows = [
+        {
+            "order_id": order_ids[code],
+            "attribute_name": item["attribute_name"],
+            "option_label": item["option_label"],
+            "price_delta": item["price_delta"],
+            "option_image_url": item["option_image_url"],
+        }
+        for code, (_, _, quote) in zip(codes, prepared)
+        for item in quote["items"]
+    ]
+    if item_rows:
+        db.execute(insert(OrderItem), item_rows)
+    record_orders(db, order_rows)
+    db.execute(insert(OperationLog), bulk_order_logs(user, "create_order", codes))
+    db.commit()
+    return {"created": len(codes), "order_codes": codes}
+
+
+@router.post("/import", response_model=OrderImportResult)
+def import_orders(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    lines = []
+    errors = []
+    try:
+        for line_no, row in read_rows(file.filename or "", file.file.read()):
+            if len(lines) + len(errors) >= MAX_IMPORT_LINES:
+                raise HTTPException(status_code=400, detail=f"单次最多导入 {MAX_IMPORT_LINES} 行")
+            try:
+                lines.append((line_no, OrderImportLine(**row_to_line(row))))
+            except (ImportFileError, ValidationError) as exc:
+                errors.append({"line": line_no, "detail": str(exc)})
+    except ImportFileError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return create_orders_bulk(db, user, lines, errors)
+
+
+@router.post("/bulk", response_model=OrderImportResult)
+def bulk_create_orders(
+    payload: list[OrderImportLine],
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    if len(payload) > MAX_IMPORT_LINES:
+        raise HTTPException(status_code=400, detail=f"单次最多导入 {MAX_IMPORT_LINES} 行")
+    return create_orders_bulk(db, user, list(enumerate(payload, start=1)), [])
+
+
+def bulk_order_rows(db: Session, user: User, ids: list[int]) -> list[dict]:
+    # One SELECT for the whole batch; salespeople may only touch their own orders.
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="请选择订单")
+    if len(ids) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"单次最多处理 {MAX_BULK_ORDERS} 个订单")
+    columns = (
+        Order.id,
+        Order.order_code,
+        Order.sales_id,
+        Order.product_id,
+        Order.distributor,
+        Order.status,
+        Order.qty,
+        Order.total_price,
+        Order.created_at,
+    )
+    rows = [row._asdict() for row in db.query(*columns).filter(Order.id.in_(ids))]
+    if len(rows) != len(ids):
+        raise HTTPException(status_code=404, detail="订单不存在")
+    if user.role == "sales" and any(row["sales_id"] != user.id for row in rows):
+        raise HTTPException(status_code=403, detail="无权限")
+    return rows
+
+
+@router.post("/bulk-status")
+def bulk_update_status(
+    payload: OrderBulkStatus,
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    if payload.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="非法状态")
+    rows = [row for row in bulk_order_rows(db, user, payload.ids) if row["status"] != payload.status]
+    if rows:
+        deltas = order_stat_deltas(rows, sign=-1)
+        order_stat_deltas([{**row, "status": payload.status} for row in rows], deltas=deltas)
+        db.query(Order).filter(Order.id.in_([row["id"] for row in rows])).update(
+            {Order.status: payload.status, Order.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+        apply_stat_deltas(db, deltas)
+        db.execute(
+            insert(OperationLog),
+            bulk_order_logs(
+                user,
+                "update_order_status",
+                [f"{row['order_code']}: {row['status']} -> {payload.status}" for row in rows],
+            ),
+        )
+        db.commit()
+    return {"ok": True, "updated": len(rows)}
+
+
+@router.post("/bulk-delete")
+def bulk_delete_orders(
+    payload: OrderBulkDelete,
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin")),
+):
+    rows = bulk_order_rows(db, user, payload.ids)
+    ids = [row["id"] for row in rows]
+    record_orders(db, rows, sign=-1)
+    db.query(OrderItem).filter(OrderItem.order_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Order).filter(Order.id.in_(ids)).delete(synchronize_session=False)
+    db.execute(insert(OperationLog), bulk_order_logs(user, "delete_order", [row["order_code"] for row in rows]))
+    db.commit()
+    return {"ok": True, "deleted": len(ids)}
 
 
 @router.put("/{order_id}", response_model=OrderRead)
@@ -126,6 +692,7 @@ def update_order(order_id: int, payload: OrderUpdate, db: Session = Depends(get_
         raise HTTPException(status_code=404, detail="订单不存在")
     if user.role == "sales" and order.sales_id != user.id:
         raise HTTPException(status_code=403, detail="无权限")
+    record_orders(db, [order], sign=-1)
     if payload.qty is not None:
         order.qty = payload.qty
     if payload.distributor is not None:
@@ -139,24 +706,10 @@ def update_order(order_id: int, payload: OrderUpdate, db: Session = Depends(get_
     if payload.remark_images is not None:
         order.remark_image_url = ",".join(payload.remark_images)
     if payload.selected_options is not None:
-        options = (
-            db.query(ProductAttributeOption)
-            .filter(ProductAttributeOption.id.in_(payload.selected_options))
-            .all()
-        )
-        if len(options) != len(payload.selected_options):
-            raise HTTPException(status_code=400, detail="属性选项不完整")
-        order.items = []
-        for option in options:
-            order.items.append(
-                OrderItem(
-                    attribute_name=option.attribute.name,
-                    option_label=option.label,
-                    price_delta=option.price_delta,
-                    option_image_url=option.image_url,
-                )
-            )
-        order.total_price = (order.product.base_price + sum(option.price_delta for option in options)) * order.qty
+        quote = pricing_tables.get(db, order.product_id).quote(payload.selected_options, order.qty)
+        order.items = order_items(quote)
+        order.total_price = quote["total_price"]
+    record_orders(db, [order])
     db.add(
         OperationLog(
             user_id=user.id,
@@ -166,8 +719,7 @@ def update_order(order_id: int, payload: OrderUpdate, db: Session = Depends(get_
         )
     )
     db.commit()
-    db.refresh(order)
-    return order
+    return load_order(db, order.id)
 
 
 @router.delete("/{order_id}")
@@ -177,6 +729,7 @@ def delete_order(order_id: int, db: Session = Depends(get_db), user=Depends(requ
         raise HTTPException(status_code=404, detail="订单不存在")
     if user.role == "sales" and order.sales_id != user.id:
         raise HTTPException(status_code=403, detail="无权限")
+    record_orders(db, [order], sign=-1)
     db.delete(order)
     db.add(
         OperationLog(
@@ -1,18 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, UploadFile, File
+import gzip
 from pathlib import Path
+from typing import Optional
 from uuid import uuid4
 import shutil
-from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload, selectinload
 from ..auth import get_current_user, require_role
+from ..catalog import (
+    add_tombstone,
+    bump_catalog_version,
+    catalog_cache,
+    catalog_version,
+    mask_product_dict,
+    price_tier,
+    touch_products,
+)
 from ..database import get_db
-from ..models import Category, OperationLog, Product, ProductAttribute, ProductAttributeOption, ProductImage
+from ..models import Category, OperationLog, Product, ProductAttribute, ProductImage
+from ..pagination import decode_cursor, encode_cursor
+from ..pricing import pricing_tables
+from ..product_assets import sync_attributes, sync_images
+from ..text_search import product_text_index
 from ..schemas import (
     CategoryRead,
     ProductAssetPayload,
     ProductCreate,
     ProductRead,
+    ProductSearchPage,
+    ProductSummaryPage,
     ProductUpdate,
 )
+from .search import index_media, refresh_catalog, sync_media, unindex_media
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
@@ -20,21 +39,134 @@ MEDIA_ROOT = Path("media")
 MEDIA_ROOT.mkdir(exist_ok=True)
 
 
-def mask_product_prices(products: list[Product]) -> list[Product]:
-    for product in products:
-        product.base_price = None
-        for attribute in product.attributes:
-            for option in attribute.options:
-                option.price_delta = None
-    return products
+def product_media_urls(product: Product) -> set[str]:
+    urls = {image.image_url for image in product.images}
+    urls.update(
+        option.image_url
+        for attribute in product.attributes
+        for option in attribute.options
+        if option.image_url
+    )
+    return urls
 
 
 @router.get("", response_model=list[ProductRead])
 def list_products(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    products = db.query(Product).order_by(Product.id.desc()).all()
-    if user.role not in {"admin", "finance"}:
-        return mask_product_prices(products)
-    return products
+    return Response(content=catalog_cache.get(db, user.role), media_type="application/json")
+
+
+def catalog_etag(role: str, version: int, since: Optional[int]) -> str:
+    return f'"catalog-{price_tier(role)}-{version}-{"full" if since is None else since}"'
+
+
+@router.get("/catalog")
+def product_catalog(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Full snapshot, or with ?since=<version> only the products changed and the ids
+    # deleted after that version. Clients revalidate with If-None-Match.
+    headers = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    etag = catalog_etag(user.role, catalog_version(db), since)
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+    version, body = catalog_cache.snapshot(db, user.role, since)
+    headers["ETag"] = catalog_etag(user.role, version, since)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def primary_image_urls(db: Session, product_ids: list[int]) -> dict[int, str]:
+    # One query per page; primary images win, otherwise the first uploaded one.
+    urls = {}
+    rows = (
+        db.query(ProductImage.product_id, ProductImage.image_url)
+        .filter(ProductImage.product_id.in_(product_ids))
+        .order_by(ProductImage.product_id, ProductImage.is_primary.desc(), ProductImage.id)
+    )
+    for product_id, image_url in rows:
+        urls.setdefault(product_id, image_url)
+    return urls
+
+
+def product_summaries(db: Session, products: list[Product]) -> list[dict]:
+    image_urls = primary_image_urls(db, [product.id for product in products]) if products else {}
+    return [
+        {
+            "id": product.id,
+            "title": product.title,
+            "brand": product.brand,
+            "category": product.category,
+            "primary_image_url": image_urls.get(product.id),
+        }
+        for product in products
+    ]
+
+
+# Grid listing: a few columns per product, keyset-paged on (created_at, id) so the
+# category filter and ordering stay on idx_products_category_id / idx_products_created_at.
+@router.get("/summary", response_model=ProductSummaryPage)
+def list_product_summaries(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    category_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    material: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    query = db.query(Product).filter(Product.created_at.isnot(None))
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    if brand:
+        query = query.filter(Product.brand == brand)
+    if material:
+        query = query.filter(Product.material == material)
+    total = query.count() if include_total else None
+    if cursor:
+        query = query.filter(tuple_(Product.created_at, Product.id) < decode_cursor(cursor))
+    products = (
+        query.options(joinedload(Product.category))
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(products[limit - 1]) if len(products) > limit else None
+    items = product_summaries(db, products[:limit])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+@router.get("/search", response_model=ProductSearchPage)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    total, product_ids = product_text_index.search(db, q, (page - 1) * page_size, page_size, category_id)
+    products = []
+    if product_ids:
+        found = {
+            product.id: product
+            for product in db.query(Product)
+            .options(joinedload(Product.category))
+            .filter(Product.id.in_(product_ids))
+        }
+        products = [found[product_id] for product_id in product_ids if product_id in found]
+    return {
+        "items": product_summaries(db, products),
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+    }
 
 
 @router.post("", response_model=ProductRead)
@@ -58,6 +190,7 @@ def create_product(
             detail=payload.title,
         )
     )
+    product.catalog_version = bump_catalog_version(db)
     db.commit()
     db.refresh(product)
     return product
@@ -67,6 +200,7 @@ def create_product(
 def update_product(
     product_id: int,
     payload: ProductUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user=Depends(require_role("product_manager", "admin", "finance")),
 ):
@@ -77,6 +211,7 @@ def update_product(
         if key == "base_price" and user.role not in {"admin", "finance"}:
             continue
         setattr(product, key, value)
+    product.pricing_version = Product.pricing_version + 1
     db.add(
         OperationLog(
             user_id=user.id,
@@ -85,8 +220,12 @@ def update_product(
             detail=str(product_id),
         )
     )
+    product.catalog_version = bump_catalog_version(db)
     db.commit()
+    pricing_tables.invalidate(product_id)
     db.refresh(product)
+    if payload.category_id is not None:
+        background_tasks.add_task(refresh_catalog, urls=list(product_media_urls(product)))
     return product
 
 
@@ -94,40 +233,17 @@ def update_product(
 def update_product_assets(
     product_id: int,
     payload: ProductAssetPayload,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user=Depends(require_role("product_manager", "admin", "finance")),
 ):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="产品不存在")
-    existing_price_map = {
-        option.id: option.price_delta
-        for attribute in product.attributes
-        for option in attribute.options
-    }
-    product.images = [
-        ProductImage(image_url=item.image_url, is_primary=item.is_primary)
-        for item in payload.images
-    ]
-    product.attributes = []
-    for attribute in payload.attributes:
-        attr = ProductAttribute(name=attribute.name, sort_order=attribute.sort_order)
-        for option in attribute.options:
-            price_delta = option.price_delta if option.price_delta is not None else 0
-            if user.role not in {"admin", "finance"}:
-                if option.id in existing_price_map:
-                    price_delta = existing_price_map[option.id]
-                else:
-                    price_delta = 0
-            attr.options.append(
-                ProductAttributeOption(
-                    label=option.label,
-                    price_delta=price_delta,
-                    image_url=option.image_url,
-                    is_default=option.is_default,
-                )
-            )
-        product.attributes.append(attr)
+    previous_urls = product_media_urls(product)
+    sync_images(db, product_id, payload)
+    sync_attributes(db, product_id, payload, keep_prices=user.role not in {"admin", "finance"})
+    product.pricing_version = Product.pricing_version + 1
     db.add(
         OperationLog(
             user_id=user.id,
@@ -136,13 +252,23 @@ def update_product_assets(
             detail=str(product_id),
         )
     )
+    product.catalog_version = bump_catalog_version(db)
     db.commit()
+    pricing_tables.invalidate(product_id)
     db.refresh(product)
+    current_urls = product_media_urls(product)
+    background_tasks.add_task(
+        sync_media,
+        list(current_urls - previous_urls),
+        list(previous_urls - current_urls),
+        list(current_urls | previous_urls),
+    )
     return product
 
 
 @router.post("/uploads")
 def upload_media(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user=Depends(require_role("product_manager", "admin", "finance")),
 ):
@@ -153,6 +279,7 @@ def upload_media(
     destination = MEDIA_ROOT / filename
     with destination.open("wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
+    background_tasks.add_task(index_media, [f"/media/{filename}"])
     return {"url": f"/media/{filename}"}
 
 
@@ -161,6 +288,25 @@ def list_categories(db: Session = Depends(get_db)):
     return db.query(Category).order_by(Category.name.asc()).all()
 
 
+# Declared after the fixed GET paths so /summary, /catalog and /categories still match.
+@router.get("/{product_id}", response_model=ProductRead)
+def get_product(product_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    product = (
+        db.query(Product)
+        .options(
+            joinedload(Product.category),
+            selectinload(Product.images),
+            selectinload(Product.attributes).selectinload(ProductAttribute.options),
+        )
+        .filter(Product.id == product_id)
+        .first()
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="产品不存在")
+    data = ProductRead.model_validate(product).model_dump(mode="json")
+    return data if price_tier(user.role) == "full" else mask_product_dict(data)
+
+
 @router.post("/categories", response_model=CategoryRead)
 def create_category(
     name: str,
@@ -180,6 +326,7 @@ def create_category(
             detail=name,
         )
     )
+    bump_catalog_version(db)
     db.commit()
     db.refresh(category)
     return category
@@ -204,6 +351,7 @@ def update_category(
             detail=name,
         )
     )
+    touch_products(db, bump_catalog_version(db), Product.category_id == category_id)
     db.commit()
     db.refresh(category)
     return category
@@ -227,6 +375,7 @@ def delete_category(
             detail=str(category_id),
         )
     )
+    touch_products(db, bump_catalog_version(db), Product.category_id == category_id)
     db.commit()
     return {"ok": True}
 
@@ -234,12 +383,14 @@ def delete_category(
 @router.delete("/{product_id}")
 def delete_product(
     product_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user=Depends(require_role("product_manager", "admin", "finance")),
 ):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="产品不存在")
+    media_urls = list(product_media_urls(product))
     db.delete(product)
     db.add(
         OperationLog(
@@ -249,5 +400,8 @@ def delete_product(
             detail=str(product_id),
         )
     )
+    add_tombstone(db, product_id, bump_catalog_version(db))
     db.commit()
+    pricing_tables.invalidate(product_id)
+    background_tasks.add_task(unindex_media, media_urls)
     return {"ok": True}
@@ -0,0 +1,97 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..auth import require_role
+from ..database import get_db
+from ..models import Category, OrderDailyStat, Product, User
+from ..schemas import SalesReport
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+def report_totals():
+    return (
+        func.coalesce(func.sum(OrderDailyStat.order_count), 0),
+        func.coalesce(func.sum(OrderDailyStat.qty), 0),
+        func.coalesce(func.sum(OrderDailyStat.revenue), 0),
+    )
+
+
+def group_columns(group_by: str) -> tuple:
+    # (key, label, extra joins) for each supported grouping.
+    if group_by == "sales":
+        return OrderDailyStat.sales_id, User.name, [(User, User.id == OrderDailyStat.sales_id)]
+    if group_by == "product":
+        return OrderDailyStat.product_id, Product.title, [(Product, Product.id == OrderDailyStat.product_id)]
+    if group_by == "category":
+        return (
+            Category.id,
+            Category.name,
+            [(Product, Product.id == OrderDailyStat.product_id), (Category, Category.id == Product.category_id)],
+        )
+    if group_by == "distributor":
+        return OrderDailyStat.distributor, OrderDailyStat.distributor, []
+    if group_by == "status":
+        return OrderDailyStat.status, OrderDailyStat.status, []
+    return OrderDailyStat.stat_date, OrderDailyStat.stat_date, []
+
+
+# Reports only read the order_daily_stats rollup, never the orders table.
+@router.get("/sales", response_model=SalesReport)
+def sales_report(
+    group_by: str = Query("date", pattern="^(date|sales|product|category|distributor|status)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[str] = None,
+    sales_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    distributor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user=Depends(require_role("sales", "admin", "finance")),
+):
+    filters = []
+    if user.role == "sales":
+        filters.append(OrderDailyStat.sales_id == user.id)
+    elif sales_id is not None:
+        filters.append(OrderDailyStat.sales_id == sales_id)
+    if date_from:
+        filters.append(OrderDailyStat.stat_date >= date_from)
+    if date_to:
+        filters.append(OrderDailyStat.stat_date <= date_to)
+    if status:
+        filters.append(OrderDailyStat.status == status)
+    if product_id is not None:
+        filters.append(OrderDailyStat.product_id == product_id)
+    if distributor is not None:
+        filters.append(OrderDailyStat.distributor == distributor)
+
+    order_count, qty, revenue = db.query(*report_totals()).filter(*filters).one()
+    key, label, joins = group_columns(group_by)
+    query = db.query(key, label, *report_totals()).select_from(OrderDailyStat)
+    for model, condition in joins:
+        query = query.outerjoin(model, condition)
+    query = query.filter(*filters).group_by(key, label)
+    if group_by == "date":
+        query = query.order_by(key)
+    else:
+        query = query.order_by(func.sum(OrderDailyStat.revenue).desc())
+    rows = [
+        {
+            "key": str(row_key) if row_key is not None else None,
+            "label": str(row_label) if row_label is not None else "未分类",
+            "order_count": row_count,
+            "qty": row_qty,
+            "revenue": row_revenue,
+        }
+        for row_key, row_label, row_count, row_qty, row_revenue in query.limit(limit)
+    ]
+    return {
+        "group_by": group_by,
+        "order_count": order_count,
+        "qty": qty,
+        "revenue": revenue,
+        "rows": rows,
+    }
@@ -1,20 +1,48 @@
+import asyncio
+import hashlib
+import logging
+import queue
+import threading
 from io import BytesIO
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
-from fastapi import APIRouter, Depends, UploadFile, File
-from PIL import Image
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sentence_transformers import SentenceTransformer
 from sqlalchemy.orm import Session
 
 from ..auth import require_role
-from ..database import get_db
-from ..models import ProductAttributeOption, ProductImage
+from ..database import SessionLocal
+from ..image_index import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    IMAGE_SUFFIXES,
+    MANIFEST_NAME,
+    MODEL_NAME,
+    add_images,
+    build_image_index,
+    decode_image,
+    embedding_key,
+    read_index,
+    remove_images,
+    update_catalog,
+    write_catalog,
+)
+from ..index_jobs import IndexBuildRunner
+from ..models import Product, ProductAttribute, ProductAttributeOption, ProductImage
+from ..query_encoder import EmbeddingCache, QueryEncoder
+from ..vector_search import make_searcher, search_rows
 
 router = APIRouter(prefix="/api/search", tags=["search"])
-INDEX_PATH = Path("media/image_index.pkl")
-MODEL_NAME = "clip-ViT-B-32"
+logger = logging.getLogger(__name__)
+INDEX_DIR = Path("media/image_index")
 _model = None
+_model_lock = threading.Lock()
+_query_encoder = None
+query_cache = EmbeddingCache()
+index_builds = IndexBuildRunner(INDEX_DIR)
 _index_cache = None
 _index_mtime = None
 TOP_K = 6
@@ -23,144 +51,299 @@ TOP_K = 6
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(MODEL_NAME)
+        with _model_lock:
+            if _model is None:
+                _model = SentenceTransformer(MODEL_NAME)
     return _model
 
 
+def get_query_encoder() -> QueryEncoder:
+    global _query_encoder
+    if _query_encoder is None:
+        _query_encoder = QueryEncoder(get_model)
+    return _query_encoder
+
+
 def load_index():
     global _index_cache, _index_mtime
-    if not INDEX_PATH.exists():
+    try:
+        mtime = (INDEX_DIR / MANIFEST_NAME).stat().st_mtime_ns
+    except FileNotFoundError:
         return None
-    mtime = INDEX_PATH.stat().st_mtime
     if _index_cache is None or _index_mtime != mtime:
-        import pickle
-
-        with INDEX_PATH.open("rb") as handle:
-            _index_cache = pickle.load(handle)
+        index_data = read_index(INDEX_DIR)
+        tombstones = set(index_data["manifest"].get("tombstones", []))
+        for segment in index_data["segments"]:
+            segment["searcher"] = make_searcher(segment["embeddings"], segment["ivf"])
+            segment["dead"] = sum(url in tombstones for url in segment["table"]["urls"])
+        index_data["tombstones"] = tombstones
+        _index_cache = index_data
         _index_mtime = mtime
     return _index_cache
 
 
-def normalize_paths(paths):
-    normalized = []
-    for path in paths:
-        path_obj = Path(path)
-        if path_obj.is_absolute():
-            try:
-                path_obj = path_obj.relative_to(Path.cwd())
-            except ValueError:
-                pass
-        if path_obj.parts and path_obj.parts[0] == "media":
-            normalized.append(f"/{'/'.join(path_obj.parts)}")
+def scope_rows(index_data: dict, segment_id: str, scopes: list) -> np.ndarray:
+    segment_scopes = index_data["scopes"].get(segment_id, {})
+    rows = None
+    for scope in scopes:
+        rows_in_scope = segment_scopes.get(scope)
+        if rows_in_scope is None:
+            return np.empty(0, dtype=np.int32)
+        rows = rows_in_scope if rows is None else np.intersect1d(rows, rows_in_scope, assume_unique=True)
+    return rows
+
+
+def rank_rows(index_data: dict, query: np.ndarray, top_k: int, scopes: Optional[list] = None):
+    tombstones = index_data["tombstones"]
+    best = {}
+    for segment in index_data["segments"]:
+        if len(segment["embeddings"]) == 0:
+            continue
+        if scopes:
+            rows = scope_rows(index_data, segment["id"], scopes)
+            rows, scores = search_rows(segment["embeddings"], rows, query, top_k)
         else:
-            normalized.append(f"/media/{path_obj.name}")
-    return normalized
+            # Over-fetch by the number of tombstoned rows so removals never shrink results.
+            rows, scores = segment["searcher"].search(query, top_k + segment["dead"])
+        urls = segment["table"]["urls"]
+        for row, score in zip(rows, scores):
+            url = urls[row]
+            if url not in tombstones and score > best.get(url, -np.inf):
+                best[url] = float(score)
+    ranked = sorted(((score, url) for url, score in best.items()), reverse=True)
+    return ranked[:top_k]
+
+
+def match_entities(index_data: dict, ranked: list) -> list:
+    entities = index_data["entities"]
+    matches = []
+    for score, url in ranked:
+        for owner in entities.get(url, []):
+            matches.append({**owner, "image_url": url, "score": score})
+    return matches
+
+
+def media_owners(db: Session, urls: Optional[set] = None) -> dict:
+    # urls limits the lookup to those images; None loads every owned image.
+    owners = {}
+    options = (
+        db.query(
+            ProductAttributeOption.id,
+            ProductAttributeOption.label,
+            ProductAttributeOption.image_url,
+            ProductAttributeOption.attribute_id,
+            ProductAttribute.product_id,
+            Product.category_id,
+        )
+        .join(ProductAttribute, ProductAttributeOption.attribute_id == ProductAttribute.id)
+        .join(Product, ProductAttribute.product_id == Product.id)
+        .filter(ProductAttributeOption.image_url.isnot(None))
+    )
+    if urls is not None:
+        options = options.filter(ProductAttributeOption.image_url.in_(urls))
+    for option_id, label, url, attribute_id, product_id, category_id in options:
+        owners.setdefault(url, []).append(
+            {
+                "type": "option",
+                "id": option_id,
+                "label": label,
+                "attribute_id": attribute_id,
+                "product_id": product_id,
+                "category_id": category_id,
+            }
+        )
+    images = db.query(
+        ProductImage.id, ProductImage.image_url, ProductImage.product_id, Product.category_id
+    ).join(Product, ProductImage.product_id == Product.id)
+    if urls is not None:
+        images = images.filter(ProductImage.image_url.in_(urls))
+    for image_id, url, product_id, category_id in images:
+        owners.setdefault(url, []).append(
+            {"type": "product", "id": image_id, "product_id": product_id, "category_id": category_id}
+        )
+    return owners
 
 
-def load_images(folder: Path):
-    for path in folder.glob("**/*"):
-        if path.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp"}:
-            yield path
+def refresh_catalog(only_if_stale: bool = False, urls: Optional[list] = None) -> None:
+    # With urls, only the owners of those images are reloaded and patched into the
+    # catalog; the full rebuild is the fallback when there is nothing to patch.
+    db = SessionLocal()
+    try:
+        if urls is not None and update_catalog(INDEX_DIR, urls, lambda changed: media_owners(db, changed)):
+            return
+        write_catalog(INDEX_DIR, media_owners(db), only_if_stale=only_if_stale)
+    except Exception:
+        logger.exception("Failed to refresh the image index catalog")
+    finally:
+        db.close()
+
+
+def search_scopes(filters: dict) -> list:
+    scopes = []
+    if filters.get("type"):
+        scopes.append(f"type:{filters['type']}")
+    for name in ("attribute", "product", "category"):
+        if filters.get(f"{name}_id") is not None:
+            scopes.append(f"{name}:{filters[f'{name}_id']}")
+    return scopes
+
+
+def match_in_scope(match: dict, filters: dict) -> bool:
+    if filters.get("type") and match["type"] != filters["type"]:
+        return False
+    for key in ("attribute_id", "product_id", "category_id"):
+        if filters.get(key) is not None and match.get(key) != filters[key]:
+            return False
+    return True
+
+
+def search_matches(index_data: dict, query: np.ndarray, filters: dict) -> list:
+    ranked = rank_rows(index_data, query, TOP_K, search_scopes(filters))
+    return [match for match in match_entities(index_data, ranked) if match_in_scope(match, filters)]
 
 
 @router.post("/image")
 async def search_by_image(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    attribute_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    match_type: Optional[str] = Query(None, alias="type", pattern="^(option|product)$"),
     user=Depends(require_role("sales", "admin")),
 ):
-    index_data = load_index()
+    filters = {
+        "attribute_id": attribute_id,
+        "product_id": product_id,
+        "category_id": category_id,
+        "type": match_type,
+    }
+    index_data = await run_in_threadpool(load_index)
     if not index_data:
         return {
             "message": "索引服务未启动，请先由管理员完成索引",
             "matches": [],
         }
-    embeddings = index_data.get("embeddings")
-    files = index_data.get("files", [])
-    if embeddings is None or len(files) == 0:
+    if index_data["manifest"].get("rows", 0) == 0:
         return {"message": "索引中没有图片，请重新构建索引", "matches": []}
+    if index_data["entities"] is None or (search_scopes(filters) and index_data["scopes"] is None):
+        # The index was (re)built without a catalog, e.g. by the CLI script.
+        await run_in_threadpool(refresh_catalog, True)
+        index_data = await run_in_threadpool(load_index)
+        if index_data["entities"] is None or (search_scopes(filters) and index_data["scopes"] is None):
+            return {"message": "索引目录尚未就绪，请稍后重试", "matches": []}
 
     image_bytes = await file.read()
+    # Salespeople re-upload the same photo often; identical bytes skip inference.
+    cache_key = embedding_key(MODEL_NAME, hashlib.sha256(image_bytes).hexdigest())
+    query = query_cache.get(cache_key)
+    if query is None:
+        try:
+            image = await run_in_threadpool(decode_image, BytesIO(image_bytes))
+        except Exception:
+            return {"message": "无法解析图片，请更换文件后重试", "matches": []}
+        try:
+            query = await asyncio.wrap_future(get_query_encoder().submit(image))
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="图片搜索繁忙，请稍后重试")
+        query_cache.put(cache_key, query)
+    matches = await run_in_threadpool(search_matches, index_data, query, filters)
+    return {"message": "ok", "matches": matches}
+
+
+def media_file(url: str):
+    if not url or not url.startswith("/media/"):
+        return None
+    path = Path(url.lstrip("/"))
+    if path.suffix.lower() not in IMAGE_SUFFIXES or not path.is_file():
+        return None
+    return path
+
+
+def index_media(urls: list, refresh: bool = True) -> None:
+    # refresh=False when the caller refreshes the catalog itself afterwards.
+    paths = [path for path in (media_file(url) for url in set(urls)) if path is not None]
+    if not paths:
+        return
     try:
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
+        add_images(INDEX_DIR, paths, get_query_encoder().encode, MODEL_NAME)
     except Exception:
-        return {"message": "无法解析图片，请更换文件后重试", "matches": []}
-
-    model = get_model()
-    query = model.encode(image)
-    query = query / np.linalg.norm(query)
-    vectors = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
-    scores = np.dot(vectors, query)
-    top_indices = np.argsort(scores)[::-1][:TOP_K]
-
-    normalized_urls = normalize_paths([files[i] for i in top_indices])
-    option_matches = (
-        db.query(ProductAttributeOption)
-        .filter(ProductAttributeOption.image_url.in_(normalized_urls))
-        .all()
-    )
-    image_matches = (
-        db.query(ProductImage).filter(ProductImage.image_url.in_(normalized_urls)).all()
-    )
-    option_map = {option.image_url: option for option in option_matches}
-    image_map = {image.image_url: image for image in image_matches}
+        logger.exception("Failed to add %d images to the image index", len(paths))
+    if refresh:
+        refresh_catalog(urls=urls)
 
-    matches = []
-    for idx in top_indices:
-        url = normalize_paths([files[idx]])[0]
-        if url in option_map:
-            option = option_map[url]
-            matches.append(
-                {
-                    "id": option.id,
-                    "label": option.label,
-                    "image_url": option.image_url,
-                    "attribute_id": option.attribute_id,
-                    "score": float(scores[idx]),
-                    "type": "option",
-                }
-            )
-        if url in image_map:
-            image = image_map[url]
-            matches.append(
-                {
-                    "id": image.id,
-                    "image_url": image.image_url,
-                    "product_id": image.product_id,
-                    "score": float(scores[idx]),
-                    "type": "product",
-                }
+
+def unindex_media(urls: list, refresh: bool = True) -> None:
+    urls = [url for url in set(urls) if url]
+    if not urls:
+        return
+    db = SessionLocal()
+    try:
+        referenced = {
+            url
+            for (url,) in db.query(ProductImage.image_url).filter(ProductImage.image_url.in_(urls))
+        } | {
+            url
+            for (url,) in db.query(ProductAttributeOption.image_url).filter(
+                ProductAttributeOption.image_url.in_(urls)
             )
-    return {"message": "ok", "matches": matches}
+        }
+        remove_images(INDEX_DIR, [url for url in urls if url not in referenced])
+    except Exception:
+        logger.exception("Failed to remove %d images from the image index", len(urls))
+    finally:
+        db.close()
+    if refresh:
+        refresh_catalog(urls=urls)
+
+
+def sync_media(added_urls: list, removed_urls: list, touched_urls: list) -> None:
+    # One catalog refresh per asset save, covering every image whose owners changed.
+    index_media(added_urls, refresh=False)
+    unindex_media(removed_urls, refresh=False)
+    refresh_catalog(urls=list({*added_urls, *removed_urls, *touched_urls}))
+
+
+@router.get("/stats")
+def search_stats(user=Depends(require_role("admin"))):
+    return {"query_cache": query_cache.stats()}
 
 
 @router.post("/index")
-def build_index(user=Depends(require_role("admin"))):
+def build_index(
+    full: bool = False,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=512),
+    workers: int = Query(DEFAULT_WORKERS, ge=1, le=64),
+    user=Depends(require_role("admin")),
+):
     media_dir = Path("media")
     if not media_dir.exists():
         return {"message": "media 目录不存在", "total_images": 0, "status": "failed"}
-    try:
-        model = get_model()
-        embeddings = []
-        files = []
-        for image_path in load_images(media_dir):
-            try:
-                image = Image.open(image_path).convert("RGB")
-                embedding = model.encode(image)
-                embeddings.append(embedding)
-                files.append(str(image_path))
-            except Exception:
-                continue
-        data = {"files": files, "embeddings": np.array(embeddings)}
-        import pickle
-
-        INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with INDEX_PATH.open("wb") as handle:
-            pickle.dump(data, handle)
-        return {
-            "message": "索引完成",
-            "total_images": len(files),
-            "status": "completed",
-        }
-    except Exception as exc:
-        return {"message": f"索引失败: {exc}", "total_images": 0, "status": "failed"}
+
+    def run(job):
+        encoder = get_query_encoder()
+        result = build_image_index(
+            media_dir,
+            INDEX_DIR,
+            lambda images: encoder.encode(images, batch_size=batch_size),
+            MODEL_NAME,
+            incremental=not full,
+            batch_size=batch_size,
+            workers=workers,
+            on_error=job.error,
+            on_progress=job.progress,
+        )
+        refresh_catalog()
+        return result
+
+    job, started = index_builds.start(run)
+    if not started:
+        return {**job, "message": "已有索引任务在运行"}
+    return job
+
+
+@router.get("/index/{job_id}")
+def index_status(job_id: str, user=Depends(require_role("admin"))):
+    job = index_builds.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="索引任务不存在")
+    return job
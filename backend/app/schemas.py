@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -106,6 +106,30 @@ class ProductRead(BaseModel):
         from_attributes = True
 
 
+class ProductSummary(BaseModel):
+    id: int
+    title: str
+    brand: Optional[str]
+    category: Optional[CategoryRead]
+    primary_image_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ProductSummaryPage(BaseModel):
+    items: List[ProductSummary]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductSummary]
+    total: int
+    page: int
+    page_size: int
+
+
 class ProductCreate(BaseModel):
     title: str
     short_description: Optional[str] = None
@@ -131,6 +155,7 @@ class ProductUpdate(BaseModel):
 
 
 class ProductImagePayload(BaseModel):
+    id: Optional[int] = None
     image_url: str
     is_primary: bool = False
 
@@ -185,6 +210,44 @@ class OrderRead(BaseModel):
         from_attributes = True
 
 
+class OrderPage(BaseModel):
+    items: List[OrderRead]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class OrderSummary(BaseModel):
+    id: int
+    order_code: str
+    status: str
+    qty: int
+    total_price: float
+    distributor: Optional[str]
+    custom_order_code: Optional[str]
+    created_at: datetime
+    sales: Optional[SalesRead]
+    product_id: int
+    product_title: Optional[str]
+    product_image_url: Optional[str]
+    items: List[OrderItemRead] = []
+
+    class Config:
+        from_attributes = True
+
+
+class OrderSummaryPage(BaseModel):
+    items: List[OrderSummary]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class OrderSearchPage(BaseModel):
+    items: List[OrderSummary]
+    total: int
+    page: int
+    page_size: int
+
+
 class OrderCreate(BaseModel):
     product_id: int
     qty: int
@@ -206,6 +269,71 @@ class OrderUpdate(BaseModel):
     remark_images: Optional[List[str]] = None
 
 
+class OrderQuoteRequest(BaseModel):
+    product_id: int
+    qty: int = 1
+    selected_options: List[int] = []
+
+
+class OrderQuoteItem(BaseModel):
+    attribute_id: int
+    attribute_name: str
+    option_id: int
+    option_label: str
+    price_delta: Optional[float]
+    option_image_url: Optional[str]
+
+
+class OrderQuoteRead(BaseModel):
+    product_id: int
+    qty: int
+    base_price: Optional[float]
+    unit_price: float
+    total_price: float
+    items: List[OrderQuoteItem] = []
+
+
+class OrderBulkStatus(BaseModel):
+    ids: List[int]
+    status: str
+
+
+class OrderBulkDelete(BaseModel):
+    ids: List[int]
+
+
+class OrderImportLine(BaseModel):
+    product_id: Optional[int] = None
+    product_title: Optional[str] = None
+    qty: int = 1
+    selected_options: List[int] = []
+    options: Dict[str, str] = {}
+    distributor: Optional[str] = None
+    custom_order_code: Optional[str] = None
+    remark_text: Optional[str] = None
+
+
+class OrderImportResult(BaseModel):
+    created: int
+    order_codes: List[str]
+
+
+class SalesReportRow(BaseModel):
+    key: Optional[str]
+    label: str
+    order_count: int
+    qty: int
+    revenue: float
+
+
+class SalesReport(BaseModel):
+    group_by: str
+    order_count: int
+    qty: int
+    revenue: float
+    rows: List[SalesReportRow] = []
+
+
 class OperationLogRead(BaseModel):
     id: int
     user_id: int
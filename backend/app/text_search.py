@@ -0,0 +1,252 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from itertools import islice
+from typing import Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from .catalog import catalog_version
+from .models import Product, ProductAttribute, ProductTombstone
+
+# Field weights; a gram found in several fields of one product keeps the highest.
+FIELD_WEIGHTS = (
+    ("title", 4),
+    ("brand", 3),
+    ("material", 2),
+    ("options", 1),
+    ("short_description", 1),
+)
+TITLE_SUBSTRING_BONUS = 8
+TITLE_PREFIX_BONUS = 4
+# Lowest field weight; postings only keep separate tiers for the weights above it.
+BASE_WEIGHT = 1
+# Titles are bucketed by their first character for the prefix bonus.
+TITLE_PREFIX_LENGTH = 1
+# Candidates scored per query (or the requested page depth, if deeper); keeps
+# typeahead on one- or two-letter input bounded.
+SCORE_LIMIT = 1000
+TERM_PATTERN = re.compile(r"[0-9a-z]+|[^\W\d_a-z]+")
+BUILD_BATCH_SIZE = 1000
+
+
+def normalize(text: str) -> str:
+    # NFKC folds full-width letters and digits, so "ＡＢＣ１" matches "abc1".
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def text_grams(text: str) -> set[str]:
+    # Latin words and CJK runs are split apart; each run contributes its characters
+    # and character bigrams, so partial words and unsegmented Chinese both match.
+    grams = set()
+    for term in TERM_PATTERN.findall(normalize(text)):
+        grams.update(term)
+        grams.update(term[index : index + 2] for index in range(len(term) - 1))
+    return grams
+
+
+def query_grams(text: str) -> set[str]:
+    # Bigrams only, unless a run is a single character.
+    grams = set()
+    for term in TERM_PATTERN.findall(normalize(text)):
+        if len(term) == 1:
+            grams.add(term)
+        else:
+            grams.update(term[index : index + 2] for index in range(len(term) - 1))
+    return grams
+
+
+def product_fields(product: Product) -> dict:
+    return {
+        "title": product.title,
+        "brand": product.brand,
+        "material": product.material,
+        "short_description": product.short_description,
+        "options": " ".join(
+            option.label for attribute in product.attributes for option in attribute.options
+        ),
+    }
+
+
+class Posting:
+    # All ids containing a gram, plus the subsets where it was found in a field
+    # weighted above BASE_WEIGHT. A product sits in at most one of the tiers.
+    __slots__ = ("members", "tiers")
+
+    def __init__(self):
+        self.members = set()
+        self.tiers = {}
+
+    def weighted(self) -> list:
+        return sorted(self.tiers.items(), reverse=True)
+
+
+class ProductTextIndex:
+    # In-process inverted index from n-grams to product ids. Like the catalog cache,
+    # it follows the shared catalog version: products stamped with a newer version and
+    # new tombstones are re-indexed before a search, so every worker sees writes made
+    # by the others without rebuilding.
+    #
+    # Candidate sets and weights are computed with C-level set operations on the
+    # postings, and the best tiers can be taken first. Only SCORE_LIMIT candidates are
+    # scored in Python per query; beyond that the total stays exact but the ranking
+    # of the tail is approximate.
+
+    def __init__(self):
+        self.version = None
+        self._postings = {}
+        self._product_grams = {}
+        self._titles = {}
+        self._title_prefixes = defaultdict(set)
+        self._categories = defaultdict(set)
+        self._product_categories = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session) -> None:
+        version = catalog_version(db)
+        if self.version == version:
+            return
+        with self._lock:
+            if self.version is None:
+                self._rebuild(db)
+            elif self.version != version:
+                self._apply_changes(db, self.version)
+            self.version = version
+
+    def search(
+        self, db: Session, q: str, offset: int, limit: int, category_id: Optional[int] = None
+    ) -> tuple[int, list[int]]:
+        self.refresh(db)
+        return self.lookup(q, offset, limit, category_id)
+
+    def lookup(self, q: str, offset: int, limit: int, category_id: Optional[int] = None) -> tuple[int, list[int]]:
+        grams = query_grams(q)
+        if not grams:
+            return 0, []
+        needle = normalize(q).strip()
+        with self._lock:
+            postings = [self._postings.get(gram) for gram in grams]
+            if not all(postings):
+                return 0, []
+            postings.sort(key=lambda posting: len(posting.members))
+            # Grams found in every product cannot narrow the result; skip their sets.
+            narrowing = [posting.members for posting in postings[1:] if len(posting.members) < len(self._titles)]
+            candidates = postings[0].members.intersection(*narrowing)
+            if category_id is not None:
+                candidates &= self._categories.get(category_id, set())
+            total = len(candidates)
+            score_limit = max(SCORE_LIMIT, offset + limit)
+            if total > score_limit:
+                candidates = self._best_candidates(postings[0], candidates, needle, score_limit)
+            ranked = heapq.nsmallest(offset + limit, self._rank_keys(candidates, postings, needle))
+        return total, [-product_id for _, _, product_id in ranked[offset:]]
+
+    def _best_candidates(self, driving: Posting, candidates: set, needle: str, score_limit: int) -> set:
+        # Title-prefix matches carry the largest bonus, then ids from the highest
+        # weight tiers of the shortest posting; stops once score_limit are collected.
+        prefixed = self._title_prefixes.get(needle[:TITLE_PREFIX_LENGTH], set()) & candidates
+        chosen = set(islice(prefixed, score_limit))
+        for members in [members for _, members in driving.weighted()] + [candidates]:
+            if len(chosen) >= score_limit:
+                break
+            matching = (
+                product_id for product_id in members if product_id in candidates and product_id not in chosen
+            )
+            chosen.update(islice(matching, score_limit - len(chosen)))
+        return chosen
+
+    def _rank_keys(self, candidates: set, postings: list, needle: str):
+        # Every candidate holds each gram at BASE_WEIGHT or better; only the weighted
+        # tiers, intersected with the candidates, add to that.
+        base = BASE_WEIGHT * len(postings)
+        scores = dict.fromkeys(candidates, base)
+        for posting in postings:
+            for weight, members in posting.tiers.items():
+                for product_id in candidates.intersection(members):
+                    scores[product_id] += weight - BASE_WEIGHT
+        for product_id, score in scores.items():
+            title = self._titles[product_id]
+            if needle in title:
+                score += TITLE_SUBSTRING_BONUS
+                if title.startswith(needle):
+                    score += TITLE_PREFIX_BONUS
+            # Shorter titles first among equal scores: they match the query more closely.
+            yield -score, len(title), -product_id
+
+    def _rebuild(self, db: Session) -> None:
+        self._postings = {}
+        self._product_grams = {}
+        self._titles = {}
+        self._title_prefixes = defaultdict(set)
+        self._categories = defaultdict(set)
+        self._product_categories = {}
+        last_id = 0
+        while True:
+            products = self._load(db, Product.id > last_id, BUILD_BATCH_SIZE)
+            if not products:
+                break
+            for product in products:
+                self.add(product)
+            last_id = products[-1].id
+
+    def _apply_changes(self, db: Session, since: int) -> None:
+        for product in self._load(db, Product.catalog_version > since):
+            self.remove(product.id)
+            self.add(product)
+        for (product_id,) in db.query(ProductTombstone.product_id).filter(
+            ProductTombstone.catalog_version > since
+        ):
+            self.remove(product_id)
+
+    def _load(self, db: Session, condition, limit: Optional[int] = None) -> list[Product]:
+        return (
+            db.query(Product)
+            .options(selectinload(Product.attributes).selectinload(ProductAttribute.options))
+            .filter(condition)
+            .order_by(Product.id)
+            .limit(limit)
+            .all()
+        )
+
+    def add(self, product: Product) -> None:
+        fields = product_fields(product)
+        weights = {}
+        for name, weight in FIELD_WEIGHTS:
+            for gram in text_grams(fields[name]):
+                if weights.get(gram, 0) < weight:
+                    weights[gram] = weight
+        for gram, weight in weights.items():
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = Posting()
+            posting.members.add(product.id)
+            if weight > BASE_WEIGHT:
+                posting.tiers.setdefault(weight, set()).add(product.id)
+        self._product_grams[product.id] = list(weights)
+        title = normalize(product.title)
+        self._titles[product.id] = title
+        self._title_prefixes[title[:TITLE_PREFIX_LENGTH]].add(product.id)
+        self._categories[product.category_id].add(product.id)
+        self._product_categories[product.id] = product.category_id
+
+    def remove(self, product_id: int) -> None:
+        for gram in self._product_grams.pop(product_id, ()):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            posting.members.discard(product_id)
+            for weight, members in list(posting.tiers.items()):
+                members.discard(product_id)
+                if not members:
+                    del posting.tiers[weight]
+            if not posting.members:
+                del self._postings[gram]
+        title = self._titles.pop(product_id, None)
+        if title is not None:
+            self._title_prefixes[title[:TITLE_PREFIX_LENGTH]].discard(product_id)
+        self._categories[self._product_categories.pop(product_id, None)].discard(product_id)
+
+
+product_text_index = ProductTextIndex()
@@ -0,0 +1,115 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+SEARCH_BACKEND = os.getenv("IMAGE_SEARCH_BACKEND", "auto")
+SEARCH_NPROBE = int(os.getenv("IMAGE_SEARCH_NPROBE", "16"))
+IVF_MIN_ROWS = int(os.getenv("IMAGE_INDEX_IVF_MIN_ROWS", "4096"))
+IVF_LISTS = int(os.getenv("IMAGE_INDEX_IVF_LISTS", "0"))
+IVF_TRAIN_POINTS_PER_LIST = 64
+IVF_ITERATIONS = 10
+ASSIGN_CHUNK = 65536
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1) if matrix.size else matrix.reshape(0, 0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def assign_clusters(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), ASSIGN_CHUNK):
+        chunk = np.asarray(embeddings[start : start + ASSIGN_CHUNK], dtype=np.float32)
+        assignments[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def train_ivf(embeddings: np.ndarray, nlist: Optional[int] = None, seed: int = 0) -> dict:
+    # Spherical k-means on a sample of the (already normalized) rows, then every
+    # row is filed under its nearest centroid as an inverted list.
+    total = len(embeddings)
+    nlist = min(total, nlist or IVF_LISTS or max(1, int(4 * np.sqrt(total))))
+    rng = np.random.default_rng(seed)
+    sample_size = min(total, nlist * IVF_TRAIN_POINTS_PER_LIST)
+    sample_rows = np.sort(rng.choice(total, sample_size, replace=False))
+    sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts[filled])[:-1]])
+        sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    assignments = assign_clusters(embeddings, centroids)
+    counts = np.bincount(assignments, minlength=nlist)
+    return {
+        "centroids": centroids,
+        "order": np.argsort(assignments, kind="stable").astype(np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+    }
+
+
+class ExactSearcher:
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def search(self, query: np.ndarray, k: int):
+        scores = self.embeddings @ query.astype(self.embeddings.dtype, copy=False)
+        rows = top_k_indices(scores, k)
+        return rows, scores[rows].astype(np.float32)
+
+
+class IVFSearcher:
+    def __init__(self, embeddings: np.ndarray, ivf: dict, nprobe: int = SEARCH_NPROBE):
+        self.embeddings = embeddings
+        self.centroids = ivf["centroids"]
+        self.order = ivf["order"]
+        self.offsets = ivf["offsets"]
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+
+    def search(self, query: np.ndarray, k: int):
+        probes = top_k_indices(self.centroids @ query, self.nprobe)
+        rows = np.concatenate(
+            [self.order[self.offsets[probe] : self.offsets[probe + 1]] for probe in probes]
+        )
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        # Sorted rows keep the gather from the mmapped matrix sequential.
+        rows.sort()
+        scores = self.embeddings[rows] @ query.astype(self.embeddings.dtype, copy=False)
+        top = top_k_indices(scores, k)
+        return rows[top], scores[top].astype(np.float32)
+
+
+def search_rows(embeddings: np.ndarray, rows: np.ndarray, query: np.ndarray, k: int):
+    if len(rows) == 0:
+        return rows, np.empty(0, dtype=np.float32)
+    scores = embeddings[rows] @ query.astype(embeddings.dtype, copy=False)
+    top = top_k_indices(scores, k)
+    return rows[top], scores[top].astype(np.float32)
+
+
+def make_searcher(embeddings: np.ndarray, ivf: Optional[dict], backend: str = SEARCH_BACKEND):
+    if backend == "exact" or ivf is None:
+        return ExactSearcher(embeddings)
+    return IVFSearcher(embeddings, ivf)
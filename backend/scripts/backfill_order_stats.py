@@ -0,0 +1,27 @@
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import SessionLocal  # noqa: E402
+from app.rollups import rebuild_order_stats  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--date-from", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--date-to", type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_order_stats(db, args.date_from, args.date_to)
+    finally:
+        db.close()
+    print(f"Rebuilt order_daily_stats: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
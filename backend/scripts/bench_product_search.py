@@ -0,0 +1,65 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.models import Product, ProductAttribute, ProductAttributeOption  # noqa: E402
+from app.text_search import ProductTextIndex  # noqa: E402
+
+NOUNS = ["沙发", "餐桌", "椅子", "床垫", "书柜", "茶几", "衣柜", "电视柜", "chair", "table", "sofa", "bed"]
+STYLES = ["现代", "北欧", "轻奢", "简约", "classic", "modern", "nordic", "vintage"]
+BRANDS = ["IKEA", "Natuzzi", "顾家", "Kuka", "MUJI", "Ashley", "Herman Miller"]
+MATERIALS = ["真皮", "布艺", "实木", "oak", "walnut", "aluminium", "rattan"]
+COLORS = ["雾霾蓝", "奶油白", "胡桃色", "black", "grey", "sand", "a1", "c2"]
+QUERIES = ["a", "c", "s", "椅", "沙", "ch", "chair", "sofa 沙发", "muji", "oak 餐桌", "雾霾", "modern c", "model-1234"]
+
+
+def synthetic_product(product_id: int, rng: random.Random) -> Product:
+    product = Product(
+        id=product_id,
+        title=f"{rng.choice(STYLES)} {rng.choice(NOUNS)} {rng.choice(STYLES)} Model-{product_id}",
+        brand=rng.choice(BRANDS),
+        material=rng.choice(MATERIALS),
+        short_description=f"{rng.choice(MATERIALS)} {rng.choice(NOUNS)}, comfortable and durable 舒适耐用",
+        category_id=rng.randint(1, 20),
+    )
+    attribute = ProductAttribute(name="颜色")
+    attribute.options = [ProductAttributeOption(label=label) for label in rng.sample(COLORS, 3)]
+    product.attributes = [attribute]
+    return product
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typeahead latency of the product text index")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="Allowed p95 per query")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    index = ProductTextIndex()
+    started = time.perf_counter()
+    for product_id in range(1, args.products + 1):
+        index.add(synthetic_product(product_id, rng))
+    print(f"Indexed {args.products} products in {time.perf_counter() - started:.1f}s")
+
+    failed = False
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            total, _ = index.lookup(query, 0, 20)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        status = "ok" if p95 <= args.budget_ms else "OVER BUDGET"
+        failed = failed or p95 > args.budget_ms
+        print(f"{query!r:>14} total={total:>6} p50={timings[len(timings) // 2]:6.2f}ms p95={p95:6.2f}ms {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
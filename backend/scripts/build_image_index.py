@@ -1,49 +1,66 @@
 import argparse
-import os
-import pickle
+import sys
 from pathlib import Path
 
-import numpy as np
-
 try:
     from sentence_transformers import SentenceTransformer
-    from PIL import Image
 except ImportError as exc:  # pragma: no cover - optional runtime
     raise SystemExit(
         "Missing dependencies for image indexing. Install sentence-transformers and pillow."
     ) from exc
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def load_images(folder: Path):
-    for path in folder.glob("**/*"):
-        if path.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp"}:
-            yield path
+from app.image_index import (  # noqa: E402
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    MODEL_NAME,
+    build_image_index,
+)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--media-dir", default="media", help="Folder with product images")
-    parser.add_argument("--output", default="media/image_index.pkl")
+    parser.add_argument("--output", default="media/image_index", help="Index directory")
+    parser.add_argument(
+        "--full", action="store_true", help="Re-encode every image instead of reusing unchanged ones"
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="Threads decoding images for the encoder"
+    )
     args = parser.parse_args()
 
     media_dir = Path(args.media_dir)
-    model = SentenceTransformer("clip-ViT-B-32")
-
-    embeddings = []
-    files = []
-    for image_path in load_images(media_dir):
-        try:
-            image = Image.open(image_path)
-            embedding = model.encode(image)
-            embeddings.append(embedding)
-            files.append(str(image_path))
-        except Exception as exc:
-            print(f"Skip {image_path}: {exc}")
-
-    data = {"files": files, "embeddings": np.array(embeddings)}
-    with open(args.output, "wb") as handle:
-        pickle.dump(data, handle)
-    print(f"Indexed {len(files)} images -> {args.output}")
+    model = SentenceTransformer(MODEL_NAME)
+
+    def encode_batch(images):
+        return model.encode(images, batch_size=args.batch_size)
+
+    def report(image_path: Path, exc: Exception):
+        print(f"Skip {image_path}: {exc}")
+
+    def progress(processed: int, total: int, elapsed: float):
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"Encoded {processed}/{total} images ({rate:.1f} img/s)")
+
+    result = build_image_index(
+        media_dir,
+        Path(args.output),
+        encode_batch,
+        MODEL_NAME,
+        incremental=not args.full,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        on_error=report,
+        on_progress=progress,
+    )
+    print(
+        f"Indexed {result['total_images']} images "
+        f"({result['encoded_images']} encoded, {result['reused_images']} reused, "
+        f"{result['images_per_second']} img/s) -> {args.output}"
+    )
 
 
 if __name__ == "__main__":
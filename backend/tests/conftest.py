@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.auth import create_access_token  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(db):
+    def make(username: str, role: str, order_prefix: str = None) -> dict:
+        db.add(
+            User(
+                name=username,
+                username=username,
+                password_hash="x",
+                role=role,
+                is_approved=True,
+                order_prefix=order_prefix,
+            )
+        )
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+    return make
@@ -0,0 +1,40 @@
+from app.models import Category, Product
+
+
+def test_bulk_import_rejects_ambiguous_product_title(client, db, auth_headers):
+    headers = auth_headers("admin01", "admin", "AD")
+    category = Category(name="沙发")
+    db.add(category)
+    db.flush()
+    db.add_all(
+        [
+            Product(title="云朵沙发", category_id=category.id),
+            Product(title="云朵沙发", category_id=category.id),
+            Product(title="北欧餐桌", category_id=category.id),
+        ]
+    )
+    db.commit()
+
+    response = client.post(
+        "/api/orders/bulk",
+        headers=headers,
+        json=[{"product_title": "北欧餐桌", "qty": 1}, {"product_title": "云朵沙发", "qty": 1}],
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == [{"line": 2, "detail": "产品名称「云朵沙发」对应多个产品，请填写产品ID"}]
+
+
+def test_bulk_import_accepts_product_id_for_shared_title(client, db, auth_headers):
+    headers = auth_headers("admin01", "admin", "AD")
+    category = Category(name="沙发")
+    db.add(category)
+    db.flush()
+    first, second = Product(title="云朵沙发", category_id=category.id), Product(title="云朵沙发", category_id=category.id)
+    db.add_all([first, second])
+    db.commit()
+
+    response = client.post("/api/orders/bulk", headers=headers, json=[{"product_id": second.id, "qty": 2}])
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
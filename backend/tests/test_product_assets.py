@@ -0,0 +1,36 @@
+from app.models import Category, Product
+
+
+def option_labels(response) -> list[str]:
+    return [option["label"] for option in response.json()["attributes"][0]["options"]]
+
+
+def test_asset_save_keeps_reordered_options(client, db, auth_headers):
+    headers = auth_headers("admin01", "admin")
+    category = Category(name="沙发")
+    db.add(category)
+    db.flush()
+    product = Product(title="云朵沙发", category_id=category.id)
+    db.add(product)
+    db.commit()
+
+    def save(labels):
+        return client.post(
+            f"/api/products/{product.id}/assets",
+            headers=headers,
+            json={
+                "images": [],
+                "attributes": [
+                    {"name": "颜色", "sort_order": 0, "options": [{"label": label} for label in labels]}
+                ],
+            },
+        )
+
+    created = save(["A", "B", "C"])
+    assert created.status_code == 200
+    assert option_labels(created) == ["A", "B", "C"]
+
+    reordered = save(["C", "B", "A"])
+    assert reordered.status_code == 200
+    assert option_labels(reordered) == ["C", "B", "A"]
+    assert option_labels(client.get(f"/api/products/{product.id}", headers=headers)) == ["C", "B", "A"]
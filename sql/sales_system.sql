@@ -17,6 +17,16 @@
 SET NAMES utf8mb4;
 SET FOREIGN_KEY_CHECKS = 0;
 
+-- ----------------------------
+-- Table structure for cache_versions
+-- ----------------------------
+DROP TABLE IF EXISTS `cache_versions`;
+CREATE TABLE `cache_versions`  (
+  `name` varchar(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `version` int NOT NULL DEFAULT 0,
+  PRIMARY KEY (`name`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for categories
 -- ----------------------------
@@ -41,7 +51,27 @@ CREATE TABLE `operation_logs`  (
   `created_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `idx_operation_logs_user_id`(`user_id`) USING BTREE
-) ENGINE = MyISAM AUTO_INCREMENT = 186 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 186 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for order_daily_stats
+-- ----------------------------
+DROP TABLE IF EXISTS `order_daily_stats`;
+CREATE TABLE `order_daily_stats`  (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `stat_date` date NOT NULL,
+  `sales_id` int NOT NULL,
+  `product_id` int NOT NULL,
+  `distributor` varchar(120) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '',
+  `status` varchar(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT 'created',
+  `order_count` int NOT NULL DEFAULT 0,
+  `qty` int NOT NULL DEFAULT 0,
+  `revenue` double NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id`) USING BTREE,
+  UNIQUE INDEX `uq_order_daily_stats_key`(`stat_date`, `sales_id`, `product_id`, `distributor`, `status`) USING BTREE,
+  INDEX `idx_order_daily_stats_sales`(`sales_id`, `stat_date`) USING BTREE,
+  INDEX `idx_order_daily_stats_product`(`product_id`, `stat_date`) USING BTREE
+) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
 -- Table structure for order_items
@@ -56,7 +86,21 @@ CREATE TABLE `order_items`  (
   `option_image_url` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `idx_order_items_order_id`(`order_id`) USING BTREE
-) ENGINE = MyISAM AUTO_INCREMENT = 93 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 93 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for order_sequences
+-- ----------------------------
+DROP TABLE IF EXISTS `order_sequences`;
+CREATE TABLE `order_sequences`  (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `prefix` varchar(4) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `category` varchar(80) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `date_code` varchar(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `last_value` int NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id`) USING BTREE,
+  UNIQUE INDEX `uq_order_sequences_key`(`prefix`, `category`, `date_code`) USING BTREE
+) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
 -- Table structure for orders
@@ -67,6 +111,8 @@ CREATE TABLE `orders`  (
   `order_code` varchar(80) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
   `sales_id` int NOT NULL,
   `product_id` int NOT NULL,
+  `product_title` varchar(200) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
+  `product_image_url` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `status` varchar(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT 'created',
   `qty` int NULL DEFAULT 1,
   `total_price` float NULL DEFAULT 0,
@@ -78,12 +124,17 @@ CREATE TABLE `orders`  (
   `updated_at` datetime NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   UNIQUE INDEX `order_code`(`order_code`) USING BTREE,
-  INDEX `idx_orders_sales_id`(`sales_id`) USING BTREE,
-  INDEX `idx_orders_product_id`(`product_id`) USING BTREE,
-  INDEX `idx_orders_created_at`(`created_at`) USING BTREE,
-  INDEX `idx_orders_status`(`status`) USING BTREE,
-  INDEX `idx_orders_custom_order_code`(`custom_order_code`) USING BTREE
-) ENGINE = MyISAM AUTO_INCREMENT = 13 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+  INDEX `idx_orders_created_at`(`created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_sales_created`(`sales_id`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_sales_status_created`(`sales_id`, `status`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_sales_distributor_created`(`sales_id`, `distributor`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_sales_product_created`(`sales_id`, `product_id`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_status_created`(`status`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_product_created`(`product_id`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_distributor_created`(`distributor`, `created_at`, `id`) USING BTREE,
+  INDEX `idx_orders_custom_order_code`(`custom_order_code`) USING BTREE,
+  FULLTEXT INDEX `ft_orders_search`(`order_code`, `custom_order_code`, `distributor`, `remark_text`) WITH PARSER `ngram`
+) ENGINE = InnoDB AUTO_INCREMENT = 13 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- ----------------------------
 -- Table structure for product_attribute_options
@@ -96,6 +147,7 @@ CREATE TABLE `product_attribute_options`  (
   `price_delta` float NULL DEFAULT 0,
   `image_url` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `is_default` tinyint(1) NULL DEFAULT 0,
+  `sort_order` int NULL DEFAULT 0,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `idx_product_attribute_options_attribute_id`(`attribute_id`) USING BTREE
 ) ENGINE = MyISAM AUTO_INCREMENT = 2073 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
@@ -126,6 +178,18 @@ CREATE TABLE `product_images`  (
   INDEX `idx_product_images_product_id`(`product_id`) USING BTREE
 ) ENGINE = MyISAM AUTO_INCREMENT = 19 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for product_tombstones
+-- ----------------------------
+DROP TABLE IF EXISTS `product_tombstones`;
+CREATE TABLE `product_tombstones`  (
+  `product_id` int NOT NULL,
+  `catalog_version` int NOT NULL,
+  `deleted_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`product_id`) USING BTREE,
+  INDEX `idx_product_tombstones_catalog_version`(`catalog_version`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for products
 -- ----------------------------
@@ -141,12 +205,16 @@ CREATE TABLE `products`  (
   `remark_enabled` tinyint(1) NULL DEFAULT 1,
   `distributor_enabled` tinyint(1) NULL DEFAULT 1,
   `custom_order_code_enabled` tinyint(1) NULL DEFAULT 1,
+  `pricing_version` int NOT NULL DEFAULT 1,
+  `catalog_version` int NOT NULL DEFAULT 0,
   `created_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `category_id`(`category_id`) USING BTREE,
   INDEX `idx_products_category_id`(`category_id`) USING BTREE,
   INDEX `idx_products_title`(`title`) USING BTREE,
-  INDEX `idx_products_created_at`(`created_at`) USING BTREE
+  INDEX `idx_products_created_at`(`created_at`) USING BTREE,
+  INDEX `idx_products_catalog_version`(`catalog_version`) USING BTREE
 ) ENGINE = MyISAM AUTO_INCREMENT = 6 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = DYNAMIC;
 
 -- ----------------------------